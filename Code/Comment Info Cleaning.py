@@ -1,82 +1,58 @@
 import pandas as pd
-import re
 import os
-from snownlp import SnowNLP
-from datetime import datetime
+from text_normalize import clean_comments
+from sentiment_cache import SentimentCache, cached_sentiments
+import nlp_service
+from clean_manifest import CleanManifest, file_hash, row_keys
+from customer_index import CustomerIndex, add_return_visits
+from stage_io import CLEANED_DTYPES, stage_path, write_stage, read_stage, export_excel
 import warnings
 
 warnings.filterwarnings('ignore')
 
 
-def clean_text(text):
-    """清洗评论内容，只保留中英文字符和中英文标点符号"""
-    if pd.isna(text):
-        return ""
+def analyze_sentiment_column(texts, cache=None, workers=1):
+    """
+    批量情感分析，先查情感得分缓存，只对新文本用SnowNLP模型批量打分（可多进程分词），返回0-1的得分
+    常驻进程（nlp_service.py）在运行时交给它打分，省去本进程加载模型的时间
+    """
+    scores = cached_sentiments(list(texts), cache, workers=workers, batch_scorer=nlp_service.sentiments)
+    # 空文本或分析失败返回中性分数
+    return [round(s, 4) if s is not None else 0.5 for s in scores]
 
-    # 移除[]标记的表情符号
-    text = re.sub(r'\[.*?\]', '', str(text))
 
-    # 定义保留的字符：中文、英文、数字、空格和常见中英文标点
-    # 中文标点：。，！？；："'（）《》【】·
-    # 英文标点：.,!?;:'"(){}[]
-    pattern = r'[^\u4e00-\u9fa5a-zA-Z0-9\s。，！？；："\'（）《》【】·\.\,\!\?\;\:\'\"\(\)\{\}\[\]］]'
-    text = re.sub(pattern, '', str(text))
-
-    # 移除多余的空格
-    text = re.sub(r'\s+', ' ', text).strip()
-
-    return text
-
-
-def analyze_sentiment(text):
-    """使用SnowNLP进行情感分析，返回0-1的得分"""
-    if not text or text.strip() == "":
-        return 0.5  # 空文本返回中性分数
-
-    try:
-        s = SnowNLP(text)
-        return round(s.sentiments, 4)
-    except:
-        return 0.5  # 分析失败返回中性分数
-
-
-def process_shop_data(df, shop_name):
-    """处理单个店铺的数据"""
+def process_shop_data(df, shop_name, cache=None, scores=None, customer_index=None, existing_df=None):
+    """
+    处理单个店铺的数据
+    :param scores: 已算好的情感得分（与df行对齐），为空时在此计算
+    :param customer_index: 全局用户访问索引，需已按 existing_df、df 的顺序加入本店铺的评论；为空时只用本店铺数据计算回头客
+    :param existing_df: 上次的清洗结果（只处理新增评论时传入），与新评论合并后一起计算回头客
+    """
     # 确保评论时间是日期格式
     df['评论时间'] = pd.to_datetime(df['评论时间'], format='%Y/%m/%d', errors='coerce')
 
     # 清洗评论内容
-    df['评论内容_清洗后'] = df['评论内容'].apply(clean_text)
+    if '评论内容_清洗后' not in df.columns:
+        df['评论内容_清洗后'] = clean_comments(df['评论内容'])
 
     # 情感分析
-    df['情感得分'] = df['评论内容_清洗后'].apply(analyze_sentiment)
-
-    # 按用户名分组，计算回头客信息
-    df = df.sort_values(['用户名', '评论时间'])  # 按用户和时间排序
+    if scores is None:
+        scores = analyze_sentiment_column(df['评论内容_清洗后'], cache)
+    df['情感得分'] = scores
 
-    # 计算每个用户的评论次数和回头客信息
-    user_stats = df.groupby('用户名').size().reset_index(name='总评论数')
-    user_first_review = df.groupby('用户名')['评论时间'].min().reset_index(name='首次评论时间')
-
-    # 合并用户统计信息
-    user_info = pd.merge(user_stats, user_first_review, on='用户名')
-
-    # 为每条评论添加序号
-    df['评论序号'] = df.groupby('用户名').cumcount() + 1
-
-    # 计算是否回头客和回头次数
-    df['是否回头客'] = df['评论序号'] > 1
-    df['回头次数'] = df['评论序号'] - 1
-
-    # 选择需要的列并重新排序
-    result_df = df[['用户名', '评分', '评论内容_清洗后', '评论时间', '情感得分', '是否回头客', '回头次数']]
-
-    # 重命名列以匹配输出要求
+    # 选择需要的列并重命名以匹配输出要求
+    result_df = df[['用户名', '评分', '评论内容_清洗后', '评论时间', '情感得分']]
     result_df = result_df.rename(columns={'评论内容_清洗后': '评论内容'})
 
-    # 格式化评论时间为字符串（保持原始格式）
-    result_df['评论时间'] = result_df['评论时间'].dt.strftime('%Y/%m/%d')
+    # 只处理了新评论时，与已有的清洗结果合并
+    if existing_df is not None:
+        existing_df = existing_df[['用户名', '评分', '评论内容', '评论时间', '情感得分']]
+        result_df = pd.concat([existing_df, result_df], ignore_index=True)
+
+    # 按用户和时间排序，计算回头客信息
+    result_df = add_return_visits(result_df, shop_name, customer_index)
 
+    # 评论时间保持日期类型写入中间结果，导出Excel时再格式化为字符串
     return result_df
 
 
@@ -84,9 +60,19 @@ def main():
     # 文件夹路径
     input_folder = r"D:\Desktop\爬虫\美团\待清洗"
     output_folder = r"D:\Desktop\爬虫\美团\清洗后"
+    # 情感得分缓存（与情感分析脚本共用）
+    cache_path = r"D:\Desktop\爬虫\美团\情感得分缓存.db"
+    # 情感分析进程数，None为CPU核数
+    workers = None
+    # 除Parquet中间结果外，是否另外导出一份Excel（仅供查看）
+    export_xlsx = False
 
     # 确保输出文件夹存在
     os.makedirs(output_folder, exist_ok=True)
+    # 增量处理清单：记录输入文件哈希和已处理的行
+    manifest = CleanManifest(os.path.join(output_folder, "清洗清单.json"))
+    # 所有店铺的全局用户访问索引，用于计算回头客和跨店铺回访
+    customer_index = CustomerIndex()
 
     # 获取所有Excel文件
     excel_files = [f for f in os.listdir(input_folder) if f.endswith(('.xlsx', '.xls'))]
@@ -96,14 +82,24 @@ def main():
         return
 
     print(f"找到 {len(excel_files)} 个Excel文件，开始处理...")
+    cache = SentimentCache(cache_path)
 
-    # 处理每个文件
+    # 读取并清洗所有文件（未变化的文件跳过，只追加了评论的文件只处理新评论）
+    shop_frames = []
     for file_name in excel_files:
         try:
-            print(f"正在处理文件: {file_name}")
-
-            # 读取Excel文件
             file_path = os.path.join(input_folder, file_name)
+            output_path = stage_path(output_folder, file_name)
+            digest = file_hash(file_path)
+            if manifest.is_unchanged(file_name, digest) and os.path.exists(output_path):
+                print(f"文件 {file_name} 未变化，跳过")
+                done = read_stage(output_path, columns=['用户名', '评论时间'])
+                customer_index.add(file_name, done['用户名'], done['评论时间'])
+                continue
+
+            print(f"正在读取文件: {file_name}")
+
+            # 读取Excel文件（整个文件读入内存；超大文件用comment_pipeline.py分块处理）
             df = pd.read_excel(file_path)
 
             # 检查必要的列是否存在
@@ -112,12 +108,59 @@ def main():
                 print(f"文件 {file_name} 缺少必要的列，跳过处理")
                 continue
 
-            # 处理数据
-            processed_df = process_shop_data(df, file_name)
+            # 找出上次处理之后新增的评论
+            keys = row_keys(df, required_columns)
+            new_mask = manifest.new_rows(file_name, keys) if os.path.exists(output_path) else None
+            existing_df = None
+            if new_mask is not None:
+                existing_df = read_stage(output_path)
+                # 中间结果与清单的行数不一致（上次在写出结果后、保存清单前中断）时整个文件重新处理
+                if len(existing_df) != new_mask.count(False):
+                    print("  - 已有结果与清单不一致，重新处理整个文件")
+                    existing_df = None
+            if existing_df is not None:
+                df = df[new_mask]
+                print(f"  - 新增评论 {len(df)} 条")
+                customer_index.add(file_name, existing_df['用户名'], existing_df['评论时间'])
+                if df.empty:
+                    manifest.update(file_name, digest, keys)
+                    manifest.save()
+                    continue
+
+            # 清洗评论内容，并把评论加入全局用户访问索引
+            df['评论内容_清洗后'] = clean_comments(df['评论内容'])
+            customer_index.add(file_name, df['用户名'],
+                               pd.to_datetime(df['评论时间'], format='%Y/%m/%d', errors='coerce'))
+            shop_frames.append((file_name, df, digest, keys, existing_df))
+
+        except Exception as e:
+            print(f"读取文件 {file_name} 时出错: {str(e)}")
+            continue
 
-            # 保存处理后的文件
-            output_path = os.path.join(output_folder, f"{file_name}")
-            processed_df.to_excel(output_path, index=False)
+    # 所有文件的评论合在一起分块，交给进程池做情感分析，再按文件拆回
+    all_texts = [text for _, df, _, _, _ in shop_frames for text in df['评论内容_清洗后']]
+    print(f"共 {len(all_texts)} 条评论，开始情感分析...")
+    all_scores = analyze_sentiment_column(all_texts, cache, workers=workers)
+
+    # 处理每个文件
+    offset = 0
+    for file_name, df, digest, keys, existing_df in shop_frames:
+        scores = all_scores[offset:offset + len(df)]
+        offset += len(df)
+        try:
+            print(f"正在处理文件: {file_name}")
+
+            # 处理数据（只处理了新评论时与已有的清洗结果合并）
+            processed_df = process_shop_data(df, file_name, cache, scores, customer_index, existing_df)
+
+            # 保存处理后的文件（Parquet中间结果，可选另存Excel）
+            output_path = stage_path(output_folder, file_name)
+            write_stage(processed_df, output_path, CLEANED_DTYPES)
+            if export_xlsx:
+                export_excel(processed_df, os.path.splitext(output_path)[0] + '.xlsx')
+            # 每个文件写出后立即保存清单，中断后重跑不会把新增评论再合并一次
+            manifest.update(file_name, digest, keys)
+            manifest.save()
 
             # 打印店铺统计信息
             total_reviews = len(processed_df)
@@ -139,6 +182,13 @@ def main():
             print(f"处理文件 {file_name} 时出错: {str(e)}")
             continue
 
+    # 跨店铺回访：评论过多家文汇路店铺的用户
+    cross_shop = customer_index.cross_shop_users(min_shops=2)
+    if not cross_shop.empty:
+        cross_shop.to_csv(os.path.join(output_folder, "跨店回访用户.csv"), index=False, encoding='utf-8-sig')
+        print(f"评论过多家店铺的用户: {len(cross_shop)} 人，已保存到 跨店回访用户.csv")
+
+    cache.close()
     print("所有文件处理完成！")
 
 
@@ -1,106 +1,99 @@
 import pandas as pd
 import os
-import jieba
-from snownlp import SnowNLP
-import re
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-
-
-# 定义文本清理函数
-def clean_text(text):
-    if pd.isna(text):
-        return ""
-    text = str(text)
-    # 去除方括号标记的表情符号
-    text = re.sub(r'\[.*?\]', '', text)
-    # 保留中文、常见标点、空格、字母数字
-    text = re.sub(r'[^\u4e00-\u9fa5，。！？；：\s\w]', '', text)
-    return text.strip()
-
-
-# 定义分词函数
-def segment_text(text):
-    if text == "":
-        return ""
-    words = jieba.cut(text)
-    return ' '.join(words)
-
-
-# 定义情感分析函数
-def sentiment_analysis(text):
-    if text == "":
-        return None
-    s = SnowNLP(text)
-    return s.sentiments
-
-
-# 定义计算字符串宽度的函数（用于Excel列宽调整）
-def get_string_width(text):
-    width = 0
-    for char in str(text):
-        if '\u4e00' <= char <= '\u9fff':  # 中文字符
-            width += 2
-        else:
-            width += 1
-    return width
-
-
-# 定义自动调整列宽的函数
-def auto_adjust_column_width(worksheet):
-    for col in worksheet.columns:
-        max_width = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            if cell.value is not None:
-                cell_width = get_string_width(cell.value)
-                if cell_width > max_width:
-                    max_width = cell_width
-        # 设置列宽：最大宽度加边距，限制最大宽度为50
-        adjusted_width = min(max_width + 2, 50)
-        worksheet.column_dimensions[col_letter].width = adjusted_width
-
-
-# 输入和输出目录
-input_dir = r"D:\Desktop\爬虫\美团\清洗后"
-output_dir = r"D:\Desktop\爬虫\美团\分析后"
-os.makedirs(output_dir, exist_ok=True)
-
-# 遍历输入目录中的所有Excel文件
-for filename in os.listdir(input_dir):
-    if filename.endswith('.xlsx') or filename.endswith('.xls'):
+from text_normalize import clean_for_nlp
+from sentiment_cache import SentimentCache, cached_sentiments
+import nlp_service
+from segmenter import Segmenter
+from parallel_sentiment import WorkerPool
+from clean_manifest import CleanManifest, file_hash
+from stage_io import ANALYZED_DTYPES, stage_path, stage_files, write_stage, read_stage, export_excel
+
+
+# 对清理后的评论分词，上次输出中已有的评论沿用其分词结果和词ID，只对新评论分词
+def segment_with_previous(texts, output_path, segmenter):
+    previous = {}
+    if os.path.exists(output_path):
+        old = read_stage(output_path)
+        if '分词ID' in old.columns:
+            previous = dict(zip(old['清理后评论'].fillna(''), zip(old['分词结果'].fillna(''), old['分词ID'])))
+    texts = texts.tolist()
+    todo = list(dict.fromkeys(t for t in texts if t not in previous))
+    if todo:
+        previous.update(zip(todo, zip(*segmenter.segment(todo))))
+    return [previous[t][0] for t in texts], [previous[t][1] for t in texts]
+
+
+def main():
+    # 输入和输出目录
+    input_dir = r"D:\Desktop\爬虫\美团\清洗后"
+    output_dir = r"D:\Desktop\爬虫\美团\分析后"
+    os.makedirs(output_dir, exist_ok=True)
+    # 情感得分缓存（与清洗脚本共用），未变化的评论不再重复调用SnowNLP
+    sentiment_cache = SentimentCache(r"D:\Desktop\爬虫\美团\情感得分缓存.db")
+    # 情感分析进程数，None为CPU核数
+    workers = None
+    # 增量处理清单：输入文件未变化且已有输出时跳过
+    manifest = CleanManifest(os.path.join(output_dir, "分析清单.json"))
+    # 除Parquet结果外，是否另外导出Excel（最终查看用）
+    export_xlsx = False
+    # jieba用户词典（菜名、店铺用语）和停用词，文件不存在时不使用
+    user_dict = r"D:\Desktop\爬虫\美团\用户词典.txt"
+    stopwords = r"D:\Desktop\爬虫\美团\停用词.txt"
+    # 情感分析和各文件的分词共用一个进程池，子进程只加载一次模型
+    pool = WorkerPool(workers)
+    segmenter = Segmenter(user_dict if os.path.exists(user_dict) else None,
+                          stopwords if os.path.exists(stopwords) else None,
+                          vocab=os.path.join(output_dir, "分词词表.json"), workers=workers, pool=pool)
+
+    # 读取清洗阶段的中间结果（Parquet，兼容旧的Excel结果）并清理文本
+    frames = []
+    for filename in stage_files(input_dir):
         input_path = os.path.join(input_dir, filename)
-        base, ext = os.path.splitext(filename)
-        output_path = os.path.join(output_dir, base + '.xlsx')  # 统一输出为.xlsx格式
+        output_path = stage_path(output_dir, filename)
+        digest = file_hash(input_path)
+        if manifest.is_unchanged(filename, digest) and os.path.exists(output_path):
+            print(f"文件 {filename} 未变化，跳过")
+            continue
 
-        # 根据文件扩展名选择引擎读取文件
-        if ext == '.xlsx':
-            df = pd.read_excel(input_path, engine='openpyxl')
-        else:  # .xls文件
-            df = pd.read_excel(input_path, engine='xlrd')
+        df = read_stage(input_path)
 
         # 检查是否存在评论内容列
         if '评论内容' not in df.columns:
             print(f"警告：文件 {filename} 中没有找到'评论内容'列，跳过处理。")
             continue
 
-        # 文本清理、分词和情感分析
-        df['清理后评论'] = df['评论内容'].apply(clean_text)
-        df['分词结果'] = df['清理后评论'].apply(segment_text)
-        df['情感得分'] = df['清理后评论'].apply(sentiment_analysis)
-
-        # 将情感得分转换为字符串，保留4位小数
-        df['情感得分'] = df['情感得分'].apply(lambda x: f"{x:.20f}" if x is not None else "")
-
-        # 保存为.xlsx文件
-        df.to_excel(output_path, index=False, engine='openpyxl')
+        # 文本清理
+        df['清理后评论'] = clean_for_nlp(df['评论内容'])
+        frames.append((filename, output_path, df, digest))
+
+    # 所有文件的评论合在一起分块，交给进程池做情感分析
+    all_texts = [text for _, _, df, _ in frames for text in df['清理后评论']]
+    # 常驻进程（nlp_service.py）在运行时交给它处理，否则在本进程计算
+    all_scores = cached_sentiments(all_texts, sentiment_cache, workers=workers, batch_scorer=nlp_service.sentiments,
+                                   pool=pool)
+
+    offset = 0
+    for filename, output_path, df, digest in frames:
+        # 分词（上次输出中已有的评论直接沿用分词结果），并按行数取回本文件的情感得分
+        df['分词结果'], df['分词ID'] = segment_with_previous(df['清理后评论'], output_path, segmenter)
+        df['情感得分'] = pd.to_numeric(pd.Series(all_scores[offset:offset + len(df)], index=df.index, dtype=object))
+        offset += len(df)
+
+        # 先保存词表，再写出引用它的分词ID
+        segmenter.vocab.save()
+        # 保存为Parquet（情感得分为float32），可选另存Excel（情感得分为数字，列宽按内容预先算好）
+        write_stage(df, output_path, ANALYZED_DTYPES)
+        if export_xlsx:
+            export_excel(df, os.path.splitext(output_path)[0] + '.xlsx')
+
+        manifest.update(filename, digest, [])
+        manifest.save()
+        print(f"处理完成：{filename}，输出到 {output_path}")
 
-        # 使用openpyxl调整列宽
-        wb = load_workbook(output_path)
-        ws = wb.active
-        auto_adjust_column_width(ws)
-        wb.save(output_path)
+    pool.close()
+    sentiment_cache.close()
+    print("所有文件处理完毕！")
 
-        print(f"处理完成：{filename}，输出到 {output_path}")
 
-print("所有文件处理完毕！")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file
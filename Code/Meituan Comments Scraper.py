@@ -1,28 +1,53 @@
 # API Docs: https://reqable.com/docs/capture/addons
 
 from reqable import *
-from datetime import datetime
-import json
-import re
-import win32com.client as win32
-
-# 时间戳转换函数
-def timestamp_to_datetime(ms_timestamp):
-    try:
-        sec_timestamp = ms_timestamp / 1000
-        dt = datetime.fromtimestamp(sec_timestamp)
-        return dt.strftime("%Y-%m-%d")
-    except Exception:
-        return "未知时间"
-
-
-# 合并评论的函数
-def merge_with_merchant_comment(original_content, merchant_comment):
-    merged = [f"原评论：{original_content}"]
-    if merchant_comment is not None:
-        reply_content = merchant_comment
-        merged.append(f"【商家回复】：{reply_content}")
-    return "\n".join(merged)
+import os
+from record_sink import BufferedSink, COMMENT_COLUMNS
+from background_writer import BackgroundWriter
+from comment_dedup import CommentDedupIndex, KEY_FIELD
+from crawl_checkpoint import CrawlCheckpoint
+from response_parser import (extract_shop_id, extract_page_offset, extract_comment_total,
+                             iter_raw_comments, parse_comment)
+
+# 评论输出文件夹（列式分片文件，只追加）
+SINK_DIR = os.path.join(os.path.expanduser("~"), "美团评论", "comments")
+# 缓冲行数或时间间隔（秒）达到任意一个即写出
+FLUSH_ROWS = 500
+FLUSH_INTERVAL = 10.0
+
+# 去重索引文件（已抓取评论的指纹）
+DEDUP_PATH = os.path.join(os.path.expanduser("~"), "美团评论", "comment_keys.bin")
+# 抓取进度库（与店铺抓包脚本共用）
+CHECKPOINT_PATH = os.path.join(os.path.expanduser("~"), "美团店铺", "crawl_progress.db")
+
+dedup = CommentDedupIndex(DEDUP_PATH)
+checkpoint = CrawlCheckpoint(CHECKPOINT_PATH)
+
+
+# 分片文件写完后，只把这一片中评论的指纹加入去重索引并落盘
+def persist_keys(rows):
+    dedup.add_keys([row[KEY_FIELD] for row in rows])
+    dedup.flush()
+
+
+# 全局写入器，reqable加载脚本后在多次响应之间复用
+sink = BufferedSink(SINK_DIR, COMMENT_COLUMNS, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL,
+                    on_flush=persist_keys)
+
+
+# 写出评论；指纹随评论一起进入缓冲区，由persist_keys在评论落盘后写入去重索引
+def write_comments(rows):
+    sink.append(rows)
+    checkpoint.flush()
+
+
+def close_writer():
+    sink.close()
+    checkpoint.close()
+
+
+# 后台线程负责写出，onResponse只入队；退出时写出剩余记录
+writer = BackgroundWriter(write_comments, on_stop=close_writer, name="comments-writer")
 
 
 def onRequest(context, request):
@@ -53,96 +78,25 @@ def onRequest(context, request):
 def onResponse(context, response):
     # 将相应体转换为JSON对象
     response.body.jsonify()
-    origin_commentlist = response.body["comments"]
-  
-    # 初始化字典
-    all_comment_list = []
-  
-    #提取用户ID、评论时间、用户评分、评论具体内容
-    for comment in origin_commentlist:
-        user_name = comment.get("userName")
-        modify_time = comment.get('modifyTime', 0)
-        comment_time = timestamp_to_datetime(modify_time)
-        star = comment.get("star", 0) / 10
-    
-        # 如果有商家回复、其他用户回复，则和用户评论合并为一条评论
-        merchant_comment = comment.get("merchantComment")
-        comment_body = comment.get("commentBody")
-        merge_comment = merge_with_merchant_comment(comment_body, merchant_comment)
-  
-        # 整理数据
-        current_data = {
-                    "用户名": user_name,
-                    "评分": star,
-                    "评论内容": merge_comment,
-                    "评论时间": comment_time
-        }
-    
-        all_comment_list.append(current_data)
-    
-    # 字符转换
-    all_comment_str = json.dumps(all_comment_list, ensure_ascii=False)
-    
-    # json列表转回python
-    match = re.search(r'\[.*\]', all_comment_str)
-    if match:
-        all_comment_list = eval(match.group())
-    else:
-        all_comment_list = []
-    
-    #导出Excel
-    file_path = r"C:\Users\15500\Desktop\美团评论\美团评论.xlsx"
-  
-    # 检查文件夹是否存在，不存在则创建
-    dir_path = os.path.dirname(file_path)
-    if not os.path.exists(dir_path):
-        os.makedirs(dir_path)
-
-    try:
-        # 尝试使用Excel.Application
-        exc = win32.Dispatch('Excel.Application')
-        exc.Visible = False  # 设置Excel窗口不可见（后台运行，不弹出界面）
-        # 检查文件是否存在，不存在则创建新工作簿
-        if os.path.exists(file_path):
-            workbook = exc.Workbooks.Open(file_path)
-        else:
-            workbook = exc.Workbooks.Add()  # 创建新工作簿
-            workbook.SaveAs(file_path)  # 保存到目标路径
-        # 选择活动工作表
-        sheet = workbook.ActiveSheet
-        # 获取数据起始行
-        if sheet.Cells(1, 1).value is None:
-            last_row = 1
-        else:
-            last_row = sheet.Cells(sheet.Rows.Count, 1).End(-4162).Row + 1
-        print(f'即将从第{last_row}行写入数据')
-        # 表头初始化
-        if sheet.Cells(1, 1).value is None:
-            headers = ['用户名', '评分', '评论内容', '评论时间']
-            for col, header in enumerate(headers, start=1):
-                sheet.Cells(1, col).value = header
-            last_row = 2   # 如果写入表头，从第二行开始写入数据
-        #从下一行写入数据主体
-        for row_data in all_comment_list:
-            for col, key in enumerate(['用户名', '评分', '评论内容', '评论时间'], start=1):
-                value = row_data.get(key)
-                sheet.Cells(last_row, col).Value = value
-            # 写完一行后，写下一行
-            last_row += 1
-        # 保存工作铺
-        workbook.Save()
-        print('数据追加成功！')
-    
-    # 无论是否出错都执行
-    except Exception as e:
-        print(f"写入数据失败：{e}")
-    
-    finally:
-        # 无论成功与否，都关闭工作簿并退出Excel
-        if 'workbook' in locals() and workbook:
-            workbook.Close()
-        if 'exc' in locals() and exc:
-            exc.Quit()
+
+    # 跳过以前抓取过的评论，只有新评论进入写出队列
+    shop_id = extract_shop_id(context.url)
+    raw_comments = list(iter_raw_comments(response.body))
+    new_comments, new_keys = dedup.filter_new(shop_id, raw_comments)
+
+    # 记录本页的抓取进度（偏移量、modifyTime水位、评论总数）
+    checkpoint.record_comment_page(shop_id, [c.get("modifyTime") for c in raw_comments],
+                                   offset=extract_page_offset(context.url),
+                                   total=extract_comment_total(response.body))
+
+    #提取用户ID、评论时间、用户评分、评论具体内容，直接生成评论记录（附带指纹）
+    all_comment_list = [dict(parse_comment(comment, shop_id), **{KEY_FIELD: key})
+                        for comment, key in zip(new_comments, new_keys)]
+
+    # 放入后台写入队列后立即返回，写出由后台线程完成；未能入队的评论释放指纹，下次抓到时仍会写出
+    if not writer.submit(all_comment_list):
+        dedup.discard(new_keys)
+        print(f"写入队列已满，丢弃{len(all_comment_list)}条评论，累计统计：{writer.stats}")
     
     return response
 
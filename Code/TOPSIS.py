@@ -1,7 +1,10 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
+from topsis_engine import topsis_by_category
+from topsis_chunked import chunked_topsis
+from topsis_sensitivity import topsis_sensitivity, save_sensitivity
+from chart_render import render_charts
 
 
 # 描述性分析：计算每个分组的指标统计量
@@ -117,31 +120,16 @@ def group_sort(group, category, indicator_start_col, positive_indices, negative_
     return sort_group_result
 
 
-# 可视化排名：横向柱状图
-def group_barh(sort_group_result, save_folder, category):
-    plt.rcParams["font.family"] = ["SimHei", "WenQuanYi Micro Hei", "Heiti TC"]
-    plt.rcParams["axes.unicode_minus"] = False
-    top_three = sort_group_result.head(3)[::-1]
-    plt.figure(figsize=(8, 5))
-    x = top_three["店铺名称"]
-    y = top_three["贴近度"]
-    plt.barh(x, y)
-    title = f"{category}排名前3的店铺"
-    plt.title(title)
-    plt.xlabel("综合得分")
-    plt.ylabel("店铺名称")
-    plt.tight_layout()
-    save_path_plot = os.path.join(save_folder, f"{title}.png")
-    plt.savefig(save_path_plot, dpi=300, bbox_inches="tight")
-    plt.show()
-    plt.close()
-    return print(f"已保存图片：{save_path_plot}")
-
-
 # 主流程（需要分离文本列/非指标列）
 def main(excel_path, sheet_name, category_col, indicator_start_col,
          positive_indices, negative_indices, save_folder,
-         desc_save_path, sort_save_path):
+         desc_save_path, sort_save_path, chunk_rows=None, chunk_save_path=None,
+         sensitivity_samples=0, sensitivity_save_path=None, chart_workers=None, skip_unchanged_charts=True):
+    # 分块模式：店铺表超过内存时多遍扫描计算排名，结果按输入顺序写到chunk_save_path（.csv/.parquet），不做描述性分析和可视化
+    if chunk_rows:
+        return chunked_topsis(excel_path, chunk_save_path, category_col, indicator_start_col,
+                              positive_indices, negative_indices, chunk_rows, sheet_name)
+
     # 检查文件夹是否存在
     os.makedirs(save_folder, exist_ok=True)
     # 读取Excel数据
@@ -152,22 +140,18 @@ def main(excel_path, sheet_name, category_col, indicator_start_col,
     except Exception as e:
         raise ValueError(f"文件读取失败：{str(e)}")
 
+    # 所有分类一次计算排名（结果与逐组调用group_sort相同）
+    final_result = topsis_by_category(df, category_col, indicator_start_col, positive_indices, negative_indices)
+
     # 分组处理数据
-    all_results = []
     all_stats = []
     for category, group in df.groupby(category_col, group_keys=True):
         print(f"\n处理分类：{category}")
         # 描述性分析
         group_stats =descriptive_analysis(group, category, indicator_start_col)
         all_stats.append(group_stats)
-        # 排名结果
-        sort_group_result = group_sort(group, category, indicator_start_col, positive_indices, negative_indices)
-        all_results.append(sort_group_result)
-        # 可视化情况
-        group_barh(sort_group_result, save_folder, category)
     # 合并所有分类结果
     desc_final = pd.concat(all_stats, ignore_index=True)
-    final_result = pd.concat(all_results, ignore_index=True)
 
     # 保存描述性分析结果
     try:
@@ -182,6 +166,16 @@ def main(excel_path, sheet_name, category_col, indicator_start_col,
         print(f"结果已成功保存到：{sort_save_path}")
     except Exception as e:
         raise ValueError(f"结果保存失败：{str(e)}")
+
+    # 可视化情况：排名完成后统一并行绘制各分类前3名的柱状图，内容未变化的分类跳过
+    render_charts(final_result, save_folder, category_col, top_n=3, workers=chart_workers,
+                  skip_unchanged=skip_unchanged_charts)
+
+    # 排名稳定性分析：在各分类熵权附近抽取多组权重重新排名，统计名次分布和相邻名次翻转概率
+    if sensitivity_samples:
+        dist_result, flip_result = topsis_sensitivity(df, category_col, indicator_start_col, positive_indices,
+                                                      negative_indices, n_samples=sensitivity_samples, seed=0)
+        save_sensitivity(dist_result, flip_result, sensitivity_save_path)
     return final_result
 
 
@@ -204,8 +198,21 @@ if __name__ == "__main__":
     DESC_SAVE_PATH = "./描述性分析结果.xlsx"
     # 排名结果保存路径
     SORT_SAVE_PATH = "./最终店铺排名.xlsx"
+    # 分块模式每块行数（None为一次读入内存；店铺表超过内存时设为如100000）
+    CHUNK_ROWS = None
+    # 分块模式排名结果保存路径（.csv或.parquet）
+    CHUNK_SAVE_PATH = "./最终店铺排名.csv"
+    # 排名稳定性分析的权重抽样组数（0为不分析）
+    SENSITIVITY_SAMPLES = 0
+    # 排名稳定性分析保存路径
+    SENSITIVITY_SAVE_PATH = "./排名稳定性分析.xlsx"
+    # 绘图进程数（None为CPU核数）
+    CHART_WORKERS = None
+    # 是否跳过内容未变化的分类图片
+    SKIP_UNCHANGED_CHARTS = True
     # 执行主流程
     final_result = main(EXCEL_PATH, SHEET_NAME, CATEGORY_COL,
                         INDICATOR_START_COL, POSITIVE_INDICES, NEGATIVE_INDICES,
-                        SAVE_FOLDER, DESC_SAVE_PATH, SORT_SAVE_PATH)
+                        SAVE_FOLDER, DESC_SAVE_PATH, SORT_SAVE_PATH, CHUNK_ROWS, CHUNK_SAVE_PATH,
+                        SENSITIVITY_SAMPLES, SENSITIVITY_SAVE_PATH, CHART_WORKERS, SKIP_UNCHANGED_CHARTS)
 
@@ -0,0 +1,112 @@
+import atexit
+import queue
+import threading
+
+
+class BackgroundWriter:
+    """
+    后台写入线程：onResponse只把提取好的记录放进有界队列后立即返回，
+    由专门的线程取出记录、攒批后调用handler写出
+    :param handler: 写出函数，接收一个记录列表
+    :param maxsize: 队列最多容纳的批次数（每次submit算一批）
+    :param batch_size: 线程每次最多合并多少条记录再调用handler
+    :param put_timeout: 队列已满时submit最多等待的秒数，超时则丢弃该批并计数
+    :param on_start: 线程启动时调用（例如COM初始化），可选
+    :param on_stop: 线程退出前调用（例如写出缓冲区），可选
+    """
+
+    def __init__(self, handler, maxsize=1000, batch_size=500, put_timeout=1.0,
+                 on_start=None, on_stop=None, name="background-writer"):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.on_start = on_start
+        self.on_stop = on_stop
+
+        # 计数器
+        self.stats = {
+            "submitted": 0,   # 提交的记录数
+            "written": 0,     # 成功写出的记录数
+            "dropped": 0,     # 因队列满被丢弃的记录数
+            "errors": 0,      # handler抛出异常的次数
+            "failed": 0,      # handler失败时涉及的记录数
+        }
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = object()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        # 进程退出时写出队列中剩余的记录
+        atexit.register(self.close)
+
+    def submit(self, records):
+        """提交一批记录，成功入队返回True；队列持续满时丢弃并返回False"""
+        records = list(records)
+        if not records:
+            return True
+        if self._closed:
+            raise RuntimeError("写入线程已关闭")
+        self._count("submitted", len(records))
+        try:
+            self._queue.put(records, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self._count("dropped", len(records))
+            return False
+
+    def pending(self):
+        """队列中尚未写出的批次数"""
+        return self._queue.qsize()
+
+    def close(self, timeout=30.0):
+        """停止接收新记录，写出队列中剩余的记录后结束线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._stop)
+        self._thread.join(timeout)
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _write(self, rows):
+        try:
+            self.handler(rows)
+            self._count("written", len(rows))
+        except Exception as e:
+            self._count("errors")
+            self._count("failed", len(rows))
+            print(f"后台写入失败：{e}")
+
+    def _run(self):
+        if self.on_start is not None:
+            self.on_start()
+        stopping = False
+        try:
+            while not stopping:
+                item = self._queue.get()
+                if item is self._stop:
+                    break
+                rows = list(item)
+                # 合并队列中已有的批次，减少handler调用次数
+                while len(rows) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is self._stop:
+                        stopping = True
+                        break
+                    rows.extend(item)
+                self._write(rows)
+        finally:
+            if self.on_stop is not None:
+                try:
+                    self.on_stop()
+                except Exception as e:
+                    self._count("errors")
+                    print(f"后台写入线程退出时出错：{e}")
+
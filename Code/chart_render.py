@@ -0,0 +1,95 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from clean_manifest import CleanManifest
+
+# 中文字体（与原来group_barh中的设置一致），只在绘图时通过rc_context生效，不修改调用方的全局设置
+CHART_RC = {"font.family": ["SimHei", "WenQuanYi Micro Hei", "Heiti TC"], "axes.unicode_minus": False}
+
+# 每个进程中复用的图表模板（每个进程只创建一次Figure）
+_template = None
+
+
+def _get_template():
+    """直接用Figure和Agg画布创建图表，不经过pyplot，也不切换调用方进程的matplotlib后端"""
+    global _template
+    if _template is None:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig = Figure(figsize=(8, 5))
+        FigureCanvasAgg(fig)
+        _template = fig, fig.subplots()
+    return _template
+
+
+def chart_tasks(final_result, save_folder, category_col, top_n=3, dpi=300):
+    """
+    由排名结果生成每个分类的绘图任务（排名结果需按分类、排名排列，即topsis_by_category的输出）
+    :return: 任务列表，每个任务是 (标题, 保存路径, 店铺名称列表, 贴近度列表, dpi)
+    """
+    tasks = []
+    for category, group in final_result.groupby(category_col, sort=True):
+        top = group.head(top_n)[::-1]
+        title = f"{category}排名前{top_n}的店铺"
+        save_path = os.path.join(save_folder, f"{title}.png")
+        tasks.append((title, save_path, [str(x) for x in top["店铺名称"]], [float(y) for y in top["贴近度"]], dpi))
+    return tasks
+
+
+def task_hash(task):
+    """绘图内容的哈希：标题、店铺名称、贴近度和dpi都不变时图片不需要重画"""
+    title, _, names, values, dpi = task
+    content = json.dumps([title, names, values, dpi], ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def render_chart(task):
+    """画一张排名前N店铺的横向柱状图（复用本进程的Figure模板）"""
+    import matplotlib
+
+    title, save_path, names, values, dpi = task
+    with matplotlib.rc_context(CHART_RC):
+        fig, ax = _get_template()
+        ax.clear()
+        ax.barh(names, values)
+        ax.set_title(title)
+        ax.set_xlabel("综合得分")
+        ax.set_ylabel("店铺名称")
+        fig.tight_layout()
+        fig.savefig(save_path, dpi=dpi, bbox_inches="tight")
+    return save_path
+
+
+def render_charts(final_result, save_folder, category_col, top_n=3, workers=None, skip_unchanged=True, dpi=300):
+    """
+    排名完成后统一绘制各分类的前N名柱状图：Agg画布，多进程并行，每个进程复用一个Figure
+    :param workers: 进程数，默认CPU核数；为1时在当前进程中绘制
+    :param skip_unchanged: 根据保存目录中的图表清单跳过内容未变化且图片仍存在的分类
+    :return: 本次绘制的图片路径列表
+    """
+    os.makedirs(save_folder, exist_ok=True)
+    manifest = CleanManifest(os.path.join(save_folder, "图表清单.json"))
+    tasks = chart_tasks(final_result, save_folder, category_col, top_n, dpi)
+    digests = {task[1]: task_hash(task) for task in tasks}
+    if skip_unchanged:
+        pending = [task for task in tasks if not (os.path.exists(task[1])
+                                                  and manifest.is_unchanged(os.path.basename(task[1]), digests[task[1]]))]
+    else:
+        pending = tasks
+    print(f"共 {len(tasks)} 个分类，需要绘制 {len(pending)} 张图片")
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pending) <= 1:
+        paths = [render_chart(task) for task in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            paths = list(executor.map(render_chart, pending, chunksize=max(1, len(pending) // (workers * 4))))
+
+    for path in paths:
+        print(f"已保存图片：{path}")
+        manifest.update(os.path.basename(path), digests[path], [])
+    manifest.save()
+    return paths
@@ -0,0 +1,66 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+
+def file_hash(path):
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_keys(df, columns):
+    """按指定列计算每行的64位哈希（十六进制字符串），同样内容的行在不同运行中得到相同的键"""
+    if df.empty:
+        return []
+    values = df[columns].astype(str)
+    hashes = pd.util.hash_pandas_object(values, index=False)
+    return [format(h, "016x") for h in hashes.tolist()]
+
+
+class CleanManifest:
+    """
+    增量处理清单：记录每个输入文件的内容哈希和已处理过的行键
+    - 文件哈希未变且输出存在：整个文件跳过
+    - 只在末尾追加了新行（上次的行键序列是本次的前缀）：只处理新行，再与已有输出合并
+    - 其他情况（删改了旧行或调整了顺序）：整个文件重新处理
+    """
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        else:
+            self.entries = {}
+
+    def is_unchanged(self, name, digest):
+        entry = self.entries.get(name)
+        return entry is not None and entry["hash"] == digest
+
+    def new_rows(self, name, keys):
+        """
+        返回新行的布尔掩码（上次的行之后追加的行为True）；旧行有改动（需要整个文件重新处理）时返回None
+        按位置比较而不是按集合比较：追加的行与旧行内容完全相同（重复导出、重复发布）时仍算新行
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        seen = entry["keys"]
+        keys = list(keys)
+        if keys[:len(seen)] != seen:
+            return None
+        return [False] * len(seen) + [True] * (len(keys) - len(seen))
+
+    def update(self, name, digest, keys):
+        self.entries[name] = {"hash": digest, "keys": list(keys)}
+
+    def save(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
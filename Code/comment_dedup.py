@@ -0,0 +1,98 @@
+import os
+import hashlib
+import threading
+from array import array
+
+
+def comment_key(shop_id, user_name, modify_time, comment_body):
+    """评论指纹：(店铺, 用户名, modifyTime, 评论原文) 的64位哈希"""
+    raw = "\x1f".join(str(v) for v in (shop_id, user_name, modify_time, comment_body))
+    digest = hashlib.blake2b(raw.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def raw_comment_key(shop_id, comment):
+    """接口返回的原始评论的指纹"""
+    return comment_key(shop_id, comment.get("userName"), comment.get("modifyTime"), comment.get("commentBody"))
+
+
+# 评论记录中携带指纹的字段（不在COMMENT_COLUMNS中，不会写入分片文件）
+KEY_FIELD = "_key"
+
+
+class CommentDedupIndex:
+    """
+    跨次抓取的评论去重索引
+    磁盘上是连续存放的64位指纹（每条8字节，只追加），启动时一次性读入集合，查询O(1)
+    """
+
+    def __init__(self, index_path):
+        index_dir = os.path.dirname(index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._pending = array("Q")
+        # 已进入写出队列、尚未落盘的评论指纹，避免同一条评论在落盘前被重复入队
+        self._in_flight = set()
+
+        keys = array("Q")
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                data = f.read()
+            # 丢弃上次异常退出时可能写了一半的尾部
+            data = data[:len(data) - len(data) % keys.itemsize]
+            keys.frombytes(data)
+        self._keys = set(keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def add_keys(self, keys):
+        """把指纹加入索引（待flush落盘），返回每个指纹是否为新出现的"""
+        is_new = []
+        with self._lock:
+            for key in keys:
+                self._in_flight.discard(key)
+                if key in self._keys:
+                    is_new.append(False)
+                    continue
+                self._keys.add(key)
+                self._pending.append(key)
+                is_new.append(True)
+        return is_new
+
+    def filter_new(self, shop_id, comments):
+        """
+        返回未见过的原始评论及其指纹 (评论列表, 指纹列表)，只做检查、不加入索引
+        返回的指纹记为"写出中"：评论落盘后调用add_keys加入索引，未能入队或写出失败时调用discard释放
+        """
+        new_comments, new_keys = [], []
+        with self._lock:
+            for comment in comments:
+                key = raw_comment_key(shop_id, comment)
+                if key in self._keys or key in self._in_flight:
+                    continue
+                self._in_flight.add(key)
+                new_comments.append(comment)
+                new_keys.append(key)
+        return new_comments, new_keys
+
+    def discard(self, keys):
+        """释放未能写出的评论指纹，之后再次抓到这些评论时仍会写出"""
+        with self._lock:
+            for key in keys:
+                self._in_flight.discard(key)
+
+    def flush(self):
+        """把新增指纹追加写入索引文件"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, array("Q")
+        with open(self.index_path, "ab") as f:
+            f.write(pending.tobytes())
+        return len(pending)
@@ -0,0 +1,206 @@
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import nlp_service
+from segmenter import Segmenter
+from parallel_sentiment import WorkerPool
+from text_normalize import clean_comments, clean_for_nlp
+from sentiment_cache import SentimentCache, cached_sentiments
+from clean_manifest import CleanManifest, file_hash
+from customer_index import CustomerIndex, add_return_visits
+from stage_io import ANALYZED_DTYPES, DATE_FORMAT, StageWriter, stage_path, write_stage, read_stage, export_excel
+from excel_stream import sheet_info, iter_excel_chunks
+
+
+# 输入文件必须包含的列
+REQUIRED_COLUMNS = ['用户名', '评分', '评论内容', '评论时间']
+
+# 输出列：清洗脚本的全部列 + NLP脚本追加的列（顺序与分两步处理时相同）
+OUTPUT_COLUMNS = ['用户名', '评分', '评论内容', '评论时间', '情感得分', '是否回头客', '回头次数', '清理后评论', '分词结果',
+                  '分词ID']
+
+# 分词词表文件名（放在输出文件夹中，分词ID按它编码）
+VOCAB_FILE = "分词词表.json"
+
+
+def analyze_comments(df, cache=None, workers=1, segmenter=None, pool=None):
+    """
+    一次遍历完成评论的清洗、分词和情感分析（不含回头客计算）
+    :param pool: WorkerPool，多个文件、多个分块复用同一个进程池
+    """
+    df = df[REQUIRED_COLUMNS].copy()
+    df['评论时间'] = pd.to_datetime(df['评论时间'], format=DATE_FORMAT, errors='coerce')
+
+    # 两套清洗规则依次作用：评论内容为清洗脚本的结果，清理后评论为NLP脚本在其基础上的结果
+    df['评论内容'] = clean_comments(df['评论内容'])
+    df['清理后评论'] = clean_for_nlp(df['评论内容'])
+    texts = df['清理后评论'].tolist()
+
+    # 分词和情感打分都只对清理后的文本做一次
+    segmenter = segmenter or Segmenter()
+    df['分词结果'], df['分词ID'] = segmenter.segment(texts)
+    scores = cached_sentiments(texts, cache, workers=workers, batch_scorer=nlp_service.sentiments, pool=pool)
+    df['情感得分'] = pd.to_numeric(pd.Series(scores, index=df.index, dtype=object))
+    return df
+
+
+def process_comments(df, shop_name, cache=None, workers=1, segmenter=None, pool=None):
+    """
+    一次遍历完成一个店铺评论的清洗、分词、情感分析和回头客计算，
+    输出与"清洗脚本 + NLP脚本"两步处理相同的列（情感得分为NLP阶段的未取整得分），另加分词ID
+    """
+    df = analyze_comments(df, cache, workers, segmenter, pool)
+    df = add_return_visits(df, shop_name)
+    return df[OUTPUT_COLUMNS]
+
+
+def stream_comments(file_path, output_path, shop_name, cache=None, workers=1, chunk_rows=50000,
+                    customer_index=None, segmenter=None, pool=None):
+    """
+    分块处理大文件：内存中只保留当前块，结果逐块追加写入Parquet
+    第一遍只读用户名和评论时间，算出每行的回头次数；第二遍逐块清洗、分词、打分并写出
+    与process_comments的区别是输出行保持输入文件的顺序（不按用户名排序）
+    :param customer_index: 全局用户访问索引，第一遍读到的评论同时加入其中
+    :return: 统计信息字典
+    """
+    shop_index = CustomerIndex()
+    for chunk in iter_excel_chunks(file_path, chunk_rows, columns=['用户名', '评论时间']):
+        times = pd.to_datetime(chunk['评论时间'], format=DATE_FORMAT, errors='coerce')
+        shop_index.add(shop_name, chunk['用户名'], times)
+        if customer_index is not None:
+            customer_index.add(shop_name, chunk['用户名'], times)
+    order, visits = shop_index.shop_visits(shop_name)
+    row_visits = np.empty(len(order), dtype=np.int64)
+    row_visits[order] = visits
+
+    # 各块共用一个分词器，分词ID按同一个词表编码
+    segmenter = segmenter or Segmenter()
+    writer = StageWriter(output_path, ANALYZED_DTYPES)
+    stats = {"rows": 0, "returning": 0, "score_sum": 0.0, "scored": 0}
+    for chunk in iter_excel_chunks(file_path, chunk_rows, columns=REQUIRED_COLUMNS):
+        df = analyze_comments(chunk, cache, workers, segmenter, pool)
+        chunk_visits = row_visits[stats["rows"]:stats["rows"] + len(df)]
+        df['是否回头客'] = chunk_visits > 0
+        df['回头次数'] = chunk_visits
+        writer.write(df[OUTPUT_COLUMNS])
+
+        stats["rows"] += len(df)
+        stats["returning"] += int(df['是否回头客'].sum())
+        stats["score_sum"] += float(df['情感得分'].sum())
+        stats["scored"] += int(df['情感得分'].notna().sum())
+    # 先保存词表，再让引用它的结果文件生效（StageWriter在close时才把临时文件改名为正式文件）
+    if segmenter.vocab.path:
+        segmenter.vocab.save()
+    writer.close()
+    return stats
+
+
+def run_pipeline(input_folder, output_folder, cache_path=None, workers=None, export_xlsx=False, chunk_rows=50000,
+                 user_dict=None, stopwords=None):
+    """
+    逐个文件读取原始评论，一次处理得到最终分析结果（Parquet），不再经过清洗后的中间文件
+    行顺序不保证一致：整体读入的文件按用户名、评论时间排序（与清洗脚本相同），分块处理的大文件保持输入顺序；
+    行内容和回头次数两种方式相同，下游需要固定顺序时应自行排序
+    只有本流水线会分块读取，单独运行的清洗脚本和NLP脚本仍整体读入每个文件
+    :param cache_path: 情感得分缓存路径，为空时不使用缓存
+    :param workers: 情感分析分词进程数，None为CPU核数
+    :param export_xlsx: 是否另外导出Excel（分块处理的大文件不导出）
+    :param chunk_rows: 超过该行数的.xlsx文件分块读取和写出（输出保持输入顺序，见上）
+    :param user_dict: jieba用户词典路径
+    :param stopwords: 停用词文件路径
+    :return: 统计信息字典
+    """
+    start = time.perf_counter()
+    os.makedirs(output_folder, exist_ok=True)
+    manifest = CleanManifest(os.path.join(output_folder, "流水线清单.json"))
+    cache = SentimentCache(cache_path) if cache_path else None
+    customer_index = CustomerIndex()
+    # 整个运行共用一个进程池，子进程只加载一次分词和情感模型
+    pool = WorkerPool(workers)
+    segmenter = Segmenter(user_dict, stopwords, vocab=os.path.join(output_folder, VOCAB_FILE), workers=workers,
+                          pool=pool)
+
+    stats = {"files": 0, "skipped": 0, "comments": 0, "errors": 0}
+    excel_files = sorted(f for f in os.listdir(input_folder) if f.endswith(('.xlsx', '.xls')))
+    for file_name in excel_files:
+        file_path = os.path.join(input_folder, file_name)
+        output_path = stage_path(output_folder, file_name)
+        try:
+            digest = file_hash(file_path)
+            if manifest.is_unchanged(file_name, digest) and os.path.exists(output_path):
+                print(f"文件 {file_name} 未变化，跳过")
+                stats["skipped"] += 1
+                done = read_stage(output_path, columns=['用户名', '评论时间'])
+                customer_index.add(file_name, done['用户名'], done['评论时间'])
+                continue
+
+            if file_name.endswith('.xlsx'):
+                columns, rows = sheet_info(file_path)
+                if not all(col in columns for col in REQUIRED_COLUMNS):
+                    print(f"文件 {file_name} 缺少必要的列，跳过处理")
+                    continue
+                if rows is None or rows > chunk_rows:
+                    shop_stats = stream_comments(file_path, output_path, file_name, cache, workers, chunk_rows,
+                                                 customer_index, segmenter, pool)
+                    manifest.update(file_name, digest, [])
+                    manifest.save()
+                    stats["files"] += 1
+                    stats["comments"] += shop_stats["rows"]
+                    print(f"处理完成（分块）：{file_name}，{shop_stats['rows']} 条评论，回头客 {shop_stats['returning']} 条，"
+                          f"平均情感得分 {shop_stats['score_sum'] / max(shop_stats['scored'], 1):.4f}")
+                    continue
+
+            df = pd.read_excel(file_path)
+            if not all(col in df.columns for col in REQUIRED_COLUMNS):
+                print(f"文件 {file_name} 缺少必要的列，跳过处理")
+                continue
+
+            result = process_comments(df, file_name, cache, workers, segmenter, pool)
+            # 先保存词表，再写出引用它的分词ID
+            segmenter.vocab.save()
+            write_stage(result, output_path, ANALYZED_DTYPES)
+            if export_xlsx:
+                export_excel(result, os.path.splitext(output_path)[0] + '.xlsx')
+            manifest.update(file_name, digest, [])
+            manifest.save()
+            customer_index.add(file_name, result['用户名'], result['评论时间'])
+
+            stats["files"] += 1
+            stats["comments"] += len(result)
+            print(f"处理完成：{file_name}，{len(result)} 条评论，"
+                  f"回头客 {int(result['是否回头客'].sum())} 条，平均情感得分 {result['情感得分'].mean():.4f}")
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"处理文件 {file_name} 时出错: {str(e)}")
+
+    # 跨店铺回访：评论过多家店铺的用户
+    cross_shop = customer_index.cross_shop_users(min_shops=2)
+    if not cross_shop.empty:
+        cross_shop.to_csv(os.path.join(output_folder, "跨店回访用户.csv"), index=False, encoding='utf-8-sig')
+
+    pool.close()
+    if cache is not None:
+        cache.close()
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    print(f"全部处理完成：{stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="评论清洗、分词、情感分析一步完成")
+    parser.add_argument("input", help="原始评论Excel所在文件夹（对应清洗脚本的输入）")
+    parser.add_argument("output", help="分析结果输出文件夹")
+    parser.add_argument("--cache", default=None, help="情感得分缓存路径（与两个脚本共用同一个缓存文件）")
+    parser.add_argument("--workers", type=int, default=None, help="分词进程数，默认CPU核数")
+    parser.add_argument("--xlsx", action="store_true", help="另外导出Excel")
+    parser.add_argument("--chunk-rows", type=int, default=50000, help="超过该行数的文件分块处理（输出保持输入顺序，不按用户名排序）")
+    parser.add_argument("--user-dict", default=None, help="jieba用户词典（菜名、店铺用语）")
+    parser.add_argument("--stopwords", default=None, help="停用词文件（每行一个词）")
+    args = parser.parse_args()
+
+    run_pipeline(args.input, args.output, cache_path=args.cache, workers=args.workers, export_xlsx=args.xlsx,
+                 chunk_rows=args.chunk_rows, user_dict=args.user_dict, stopwords=args.stopwords)
@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS crawl_progress (
+    shop_id             TEXT PRIMARY KEY,
+    detail_captured_at  TEXT,
+    comment_pages       INTEGER NOT NULL DEFAULT 0,
+    comments_seen       INTEGER NOT NULL DEFAULT 0,
+    max_offset          INTEGER,
+    min_modify_time     INTEGER,
+    max_modify_time     INTEGER,
+    total_comments      INTEGER,
+    comments_updated_at TEXT
+)
+"""
+
+# 多个进程共用同一个库时，只让进度往前推进
+UPSERT_SQL = """
+INSERT INTO crawl_progress (shop_id, detail_captured_at, comment_pages, comments_seen, max_offset,
+                            min_modify_time, max_modify_time, total_comments, comments_updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(shop_id) DO UPDATE SET
+    detail_captured_at  = COALESCE(MAX(excluded.detail_captured_at, detail_captured_at), detail_captured_at, excluded.detail_captured_at),
+    comment_pages       = comment_pages + excluded.comment_pages,
+    comments_seen       = comments_seen + excluded.comments_seen,
+    max_offset          = COALESCE(MAX(excluded.max_offset, max_offset), max_offset, excluded.max_offset),
+    min_modify_time     = COALESCE(MIN(excluded.min_modify_time, min_modify_time), min_modify_time, excluded.min_modify_time),
+    max_modify_time     = COALESCE(MAX(excluded.max_modify_time, max_modify_time), max_modify_time, excluded.max_modify_time),
+    total_comments      = COALESCE(excluded.total_comments, total_comments),
+    comments_updated_at = COALESCE(MAX(excluded.comments_updated_at, comments_updated_at), comments_updated_at, excluded.comments_updated_at)
+"""
+
+COLUMNS = ["shop_id", "detail_captured_at", "comment_pages", "comments_seen", "max_offset",
+           "min_modify_time", "max_modify_time", "total_comments", "comments_updated_at"]
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+class CrawlCheckpoint:
+    """
+    抓取进度记录：每个店铺的详情页抓取时间、评论已抓到的最大偏移量和modifyTime水位
+    onResponse中只更新内存（很快），由后台写入线程调用flush批量落盘
+    """
+
+    def __init__(self, db_path):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(CREATE_SQL)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def _entry(self, shop_id):
+        shop_id = str(shop_id)
+        entry = self._pending.get(shop_id)
+        if entry is None:
+            entry = dict.fromkeys(COLUMNS)
+            entry.update(shop_id=shop_id, comment_pages=0, comments_seen=0)
+            self._pending[shop_id] = entry
+        return entry
+
+    def record_detail(self, shop_id, captured_at=None):
+        """记录店铺详情页的抓取时间"""
+        if shop_id is None:
+            return
+        captured_at = captured_at or datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            entry = self._entry(shop_id)
+            entry["detail_captured_at"] = _max(entry["detail_captured_at"], captured_at)
+
+    def record_comment_page(self, shop_id, modify_times, offset=None, total=None, captured_at=None):
+        """
+        记录抓到的一页评论
+        :param modify_times: 本页各评论的modifyTime（毫秒时间戳）
+        :param offset: 本页的偏移量（来自请求参数），未知则为None
+        :param total: 接口返回的评论总数，未知则为None
+        """
+        if shop_id is None:
+            return
+        modify_times = [t for t in modify_times if t]
+        captured_at = captured_at or datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            entry = self._entry(shop_id)
+            entry["comment_pages"] += 1
+            entry["comments_seen"] += len(modify_times)
+            entry["max_offset"] = _max(entry["max_offset"], offset)
+            if modify_times:
+                entry["min_modify_time"] = _min(entry["min_modify_time"], min(modify_times))
+                entry["max_modify_time"] = _max(entry["max_modify_time"], max(modify_times))
+            if total is not None:
+                entry["total_comments"] = total
+            entry["comments_updated_at"] = _max(entry["comments_updated_at"], captured_at)
+
+    def flush(self):
+        """把内存中的进度合并写入数据库"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            with self._conn:
+                self._conn.executemany(UPSERT_SQL, [[e[c] for c in COLUMNS] for e in pending.values()])
+        return len(pending)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def progress(self, shop_id=None):
+        """查询进度，返回DataFrame；shop_id为空时返回全部店铺"""
+        import pandas as pd
+
+        self.flush()
+        with self._lock:
+            if shop_id is None:
+                return pd.read_sql_query("SELECT * FROM crawl_progress ORDER BY shop_id", self._conn)
+            return pd.read_sql_query("SELECT * FROM crawl_progress WHERE shop_id = ?",
+                                     self._conn, params=[str(shop_id)])
+
+    def watermark(self, shop_id):
+        """店铺已抓到的最新modifyTime，下次只需抓取比它新的评论；没有记录返回None"""
+        df = self.progress(shop_id)
+        if df.empty:
+            return None
+        value = df["max_modify_time"].iloc[0]
+        return None if value is None or value != value else int(value)
+
+    def stale_shops(self, max_age=timedelta(days=1), shop_ids=None):
+        """
+        详情页或评论超过max_age没有抓取的店铺
+        :param shop_ids: 需要覆盖的全部店铺ID（例如店铺库中的店铺），从未抓取过的也算过期
+        """
+        df = self.progress()
+        cutoff = (datetime.now() - max_age).isoformat(timespec="seconds")
+        stale = df[(df["detail_captured_at"].fillna("") < cutoff)
+                   | (df["comments_updated_at"].fillna("") < cutoff)]["shop_id"].tolist()
+        if shop_ids is not None:
+            known = set(df["shop_id"])
+            stale += [str(s) for s in shop_ids if str(s) not in known]
+        return stale
+
+    def incomplete_shops(self, page_size=10):
+        """
+        评论未抓全的店铺：已知评论总数且抓到的偏移量未到末页，或尚未抓过评论
+        comment_pages、comments_seen是累计值（同一页重复抓取会重复计数），不能用来判断是否抓全，只看最大偏移量
+        :param page_size: 每页评论数，用于判断最大偏移量是否已到末页
+        """
+        df = self.progress()
+        no_comments = df["comment_pages"] == 0
+        has_total = df["total_comments"].notna()
+        reached = df["max_offset"].fillna(-page_size) + page_size >= df["total_comments"]
+        return df[no_comments | (has_total & ~reached)]["shop_id"].tolist()
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+# scipy为可选依赖：有则用稀疏矩阵乘法计算店铺共同用户数，否则按用户自连接计数
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+class CustomerIndex:
+    """
+    全局用户访问索引：所有店铺的评论逐批加入，用户名编码为整数，
+    全部加入后一次排序，即可回答单店回头客和跨店铺回访（同一用户评论过文汇路多家店铺）的问题
+    用户名为空的评论不计为回头客，也不参与跨店统计
+    """
+
+    def __init__(self):
+        self._user_codes = {}   # 用户名 -> 编码
+        self._user_names = []   # 编码 -> 用户名
+        self._shop_codes = {}   # 店铺名 -> 编码
+        self._shop_names = []
+        self._chunks = []       # 每批的 (店铺编码, 用户编码数组, 时间数组)
+        self._built = None
+
+    def add(self, shop, user_names, times):
+        """
+        加入一个店铺的一批评论（同一店铺可多次加入，行号按加入顺序接续）
+        :param user_names: 用户名序列
+        :param times: 评论时间序列（datetime64，无法解析的为NaT）
+        """
+        if shop not in self._shop_codes:
+            self._shop_codes[shop] = len(self._shop_names)
+            self._shop_names.append(shop)
+        # 先在本批内factorize，再只对去重后的用户名查全局编码表
+        local_codes, uniques = pd.factorize(pd.Series(user_names, dtype=object))
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, name in enumerate(uniques):
+            code = self._user_codes.get(name)
+            if code is None:
+                code = self._user_codes[name] = len(self._user_names)
+                self._user_names.append(name)
+            mapping[i] = code
+        if len(uniques) == 0:
+            # 整批用户名都为空：mapping为空数组，不能按下标取值
+            codes = np.full(len(local_codes), -1, dtype=np.int64)
+        else:
+            codes = np.where(local_codes >= 0, mapping[np.maximum(local_codes, 0)], -1)
+        # NaT按最晚时间处理（与sort_values把NaT排在最后一致）
+        stamps = pd.to_datetime(pd.Series(times)).to_numpy(dtype="datetime64[ns]").view(np.int64).copy()
+        stamps[stamps == np.iinfo(np.int64).min] = np.iinfo(np.int64).max
+        self._chunks.append((self._shop_codes[shop], codes, stamps))
+        self._built = None
+
+    def _build(self):
+        """合并所有批次，按 店铺、用户名、时间、加入顺序 排序一次，算出每条评论是该用户在该店的第几次评论"""
+        if self._built is not None:
+            return self._built
+        if self._chunks:
+            shops = np.concatenate([np.full(len(c), s, dtype=np.int64) for s, c, _ in self._chunks])
+            users = np.concatenate([c for _, c, _ in self._chunks])
+            stamps = np.concatenate([t for _, _, t in self._chunks])
+        else:
+            shops = users = stamps = np.zeros(0, dtype=np.int64)
+
+        # 用户编码换成按用户名排序的名次，排序结果与按用户名字符串排序一致；空用户名排在最后
+        n_users = len(self._user_names)
+        rank = np.empty(n_users + 1, dtype=np.int64)
+        names = np.array([str(name) for name in self._user_names], dtype=object)
+        rank[np.argsort(names, kind="stable")] = np.arange(n_users)
+        rank[n_users] = n_users
+        user_rank = rank[np.where(users >= 0, users, n_users)]
+
+        order = np.lexsort((np.arange(len(users)), stamps, user_rank, shops))
+        s_shops, s_users = shops[order], users[order]
+        new_group = np.ones(len(order), dtype=bool)
+        new_group[1:] = (s_shops[1:] != s_shops[:-1]) | (s_users[1:] != s_users[:-1])
+        starts = np.flatnonzero(new_group)
+        group_start = starts[np.cumsum(new_group) - 1]
+        visits = np.arange(len(order)) - group_start
+        visits[s_users < 0] = 0
+
+        # 每行在其店铺内的行号（按加入顺序编号，同一店铺的批次在全局中不一定连续）
+        by_shop = np.argsort(shops, kind="stable")
+        shop_starts = np.searchsorted(shops[by_shop], shops[by_shop])
+        local_rows = np.empty(len(shops), dtype=np.int64)
+        local_rows[by_shop] = np.arange(len(shops)) - shop_starts
+
+        self._built = {"shops": shops, "users": users, "order": order, "sorted_shops": s_shops,
+                       "visits": visits, "local_rows": local_rows}
+        return self._built
+
+    def shop_visits(self, shop):
+        """
+        返回 (order, visits)：order为该店铺行号（按加入顺序编号）按用户名、评论时间排好的顺序，
+        visits为对应行的回头次数（0表示首次评论）
+        """
+        built = self._build()
+        code = self._shop_codes[shop]
+        start, stop = np.searchsorted(built["sorted_shops"], [code, code + 1])
+        rows = built["order"][start:stop]
+        return built["local_rows"][rows], built["visits"][start:stop]
+
+    def user_shop_counts(self):
+        """每个用户在每家店的评论数：DataFrame(用户名, 店铺, 评论数)"""
+        built = self._build()
+        valid = built["users"] >= 0
+        pairs = pd.DataFrame({"user": built["users"][valid], "shop": built["shops"][valid]})
+        counts = pairs.groupby(["user", "shop"], sort=False).size().reset_index(name="评论数")
+        return pd.DataFrame({
+            "用户名": np.array(self._user_names, dtype=object)[counts["user"].to_numpy()],
+            "店铺": np.array(self._shop_names, dtype=object)[counts["shop"].to_numpy()],
+            "评论数": counts["评论数"].to_numpy(),
+        })
+
+    def cross_shop_users(self, min_shops=2):
+        """评论过至少min_shops家店铺的用户：DataFrame(用户名, 店铺数, 评论数, 店铺列表)，按店铺数降序"""
+        counts = self.user_shop_counts()
+        summary = counts.groupby("用户名", sort=False).agg(
+            店铺数=("店铺", "size"), 评论数=("评论数", "sum"), 店铺列表=("店铺", lambda s: "、".join(map(str, s))))
+        summary = summary[summary["店铺数"] >= min_shops]
+        return summary.sort_values(["店铺数", "评论数"], ascending=False).reset_index()
+
+    def shop_overlap(self):
+        """
+        店铺×店铺的共同用户数矩阵（对角线为各店铺的用户数）
+        只用去重后的 (用户, 店铺) 对计算，不生成 用户数×店铺数 的稠密矩阵
+        """
+        built = self._build()
+        valid = built["users"] >= 0
+        n_shops = len(self._shop_names)
+        pairs = np.unique(built["users"][valid].astype(np.int64) * n_shops + built["shops"][valid])
+        users, shops = pairs // n_shops, pairs % n_shops
+        if sparse is not None:
+            matrix = sparse.coo_matrix((np.ones(len(pairs), dtype=np.int64), (users, shops)),
+                                       shape=(len(self._user_names), n_shops)).tocsr()
+            overlap = (matrix.T @ matrix).toarray()
+        else:
+            # 同一用户评论过的店铺两两配对计数
+            pair_df = pd.DataFrame({"user": users, "shop": shops})
+            joined = pair_df.merge(pair_df, on="user")
+            overlap = np.zeros((n_shops, n_shops), dtype=np.int64)
+            np.add.at(overlap, (joined["shop_x"].to_numpy(), joined["shop_y"].to_numpy()), 1)
+        return pd.DataFrame(overlap, index=self._shop_names, columns=self._shop_names)
+
+
+def add_return_visits(df, shop_name=None, customer_index=None):
+    """
+    按用户和评论时间排序，计算是否回头客和回头次数（评论时间需为日期格式）
+    :param customer_index: 已按df的行顺序加入本店铺评论的索引，为空时只用df建索引
+    """
+    if customer_index is None:
+        customer_index = CustomerIndex()
+        customer_index.add(shop_name, df['用户名'], df['评论时间'])
+
+    # 索引中已按用户、时间排好序，直接取本店铺的行顺序和每条评论的回头次数
+    order, visits = customer_index.shop_visits(shop_name)
+    df = df.iloc[order].copy()
+    df['是否回头客'] = visits > 0
+    df['回头次数'] = visits
+    return df
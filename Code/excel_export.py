@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+# xlsxwriter为可选依赖：安装后以常量内存模式一次写出（含列宽），否则退回pandas的to_excel（不调整列宽）
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+
+# 列宽上限（与原来的自动调整列宽一致）
+MAX_COLUMN_WIDTH = 50
+
+# 按两个字符宽度计算的中文字符范围
+CJK_PATTERN = r"[一-鿿]"
+
+
+def display_widths(values):
+    """一列字符串的显示宽度（中文字符按2计，其余按1计），向量化计算"""
+    values = pd.Series(values, dtype="string")
+    widths = values.str.len() + values.str.count(CJK_PATTERN)
+    return widths.fillna(0).astype(np.int64)
+
+
+def column_widths(df):
+    """每列的列宽：表头和各单元格显示宽度的最大值加2，最大为50；空值不参与计算"""
+    widths = []
+    for column in df.columns:
+        values = df[column]
+        values = values[values.notna()].astype(str)
+        width = int(display_widths(pd.concat([pd.Series([str(column)]), values], ignore_index=True)).max())
+        widths.append(min(width + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def _cell_values(series):
+    """转换为可直接写入的Python值列表，空值为None（写出时跳过）"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    values = series.astype(object).where(series.notna(), None)
+    return values.tolist()
+
+
+def write_xlsx(df, path, sheet_name="Sheet1"):
+    """
+    把DataFrame写成xlsx：先按列算好列宽，再用xlsxwriter常量内存模式逐行写出，只写一遍文件
+    数值列写为数字，字符串原样写入（不会被当成公式或链接）
+    """
+    if xlsxwriter is None:
+        df.to_excel(path, index=False, sheet_name=sheet_name)
+        return
+
+    workbook = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+        "strings_to_numbers": False,
+    })
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        # 与pandas导出的表头样式一致：加粗、细边框、居中
+        header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        for i, width in enumerate(column_widths(df)):
+            worksheet.set_column(i, i, width)
+
+        worksheet.write_row(0, 0, [str(c) for c in df.columns], header_format)
+        columns = [_cell_values(df[c]) for c in df.columns]
+        for row, values in enumerate(zip(*columns), start=1):
+            worksheet.write_row(row, 0, values)
+    finally:
+        workbook.close()
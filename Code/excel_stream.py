@@ -0,0 +1,49 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+
+def sheet_info(path):
+    """
+    读取工作表的表头和数据行数（不含表头），不加载单元格数据
+    :return: (列名列表, 行数)；工作表没有记录尺寸信息时行数为None
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        header = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        rows = ws.max_row - 1 if ws.max_row else None
+        return [h for h in header if h is not None], rows
+    finally:
+        wb.close()
+
+
+def iter_excel_chunks(path, chunk_rows=50000, columns=None, sheet_name=None):
+    """
+    用openpyxl只读模式逐行读取工作表，每chunk_rows行组成一个DataFrame返回，内存中只保留当前块
+    :param columns: 只取这些列（默认全部列）
+    :param sheet_name: 工作表名称（默认第一个工作表）
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.active
+        rows = ws.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        names = columns or [h for h in header if h is not None]
+        missing = [c for c in names if c not in header]
+        if missing:
+            raise KeyError(f"工作表缺少列：{missing}")
+        positions = [header.index(c) for c in names]
+
+        buffer = []
+        for row in rows:
+            # 跳过全空的行（只读模式下工作表末尾常有格式残留的空行）
+            if all(v is None for v in row):
+                continue
+            buffer.append([row[i] if i < len(row) else None for i in positions])
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=names)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=names)
+    finally:
+        wb.close()
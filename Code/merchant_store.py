@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+
+# 抓取字段 -> 数据库列
+FIELD_COLUMNS = [
+    ("店铺ID", "shop_id"),
+    ("店铺名", "name"),
+    ("店铺分类", "category"),
+    ("评分", "score"),
+    ("人均（元）", "avg_price"),
+    ("最低消费（元）", "lowest_price"),
+    ("店铺地址", "address"),
+    ("店铺经纬度", "location"),
+    ("营业时间", "open_time"),
+    ("WIFI", "wifi"),
+    ("停车位", "park"),
+]
+
+# TOPSIS.py / Cluster Map.py 读取的列布局（店铺经纬度在E列，指标从第6列开始）
+EXPORT_COLUMNS = [
+    ("shop_id", "店铺ID"),
+    ("name", "店铺名称"),
+    ("category", "店铺分类"),
+    ("address", "店铺地址"),
+    ("location", "店铺经纬度"),
+    ("score", "总评分"),
+    ("avg_price", "人均（元）"),
+]
+
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS merchants (
+    shop_id      INTEGER PRIMARY KEY,
+    name         TEXT,
+    category     TEXT,
+    score        REAL,
+    avg_price    REAL,
+    lowest_price REAL,
+    address      TEXT,
+    location     TEXT,
+    open_time    TEXT,
+    wifi         INTEGER,
+    park         INTEGER,
+    first_seen   TEXT NOT NULL,
+    last_seen    TEXT NOT NULL
+)
+"""
+
+
+class MerchantStore:
+    """
+    店铺信息本地库（SQLite），以店铺ID为主键
+    同一店铺重复抓取时更新字段和last_seen，而不是再追加一行
+    """
+
+    def __init__(self, db_path):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        # 由后台写入线程使用，允许跨线程访问，用锁串行化
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(CREATE_SQL)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def upsert_many(self, records):
+        """批量写入店铺记录（抓取字段名的字典列表），已存在的店铺更新字段和last_seen"""
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = []
+        for record in records:
+            if record.get("店铺ID") is None:
+                continue
+            rows.append([record.get(field) for field, _ in FIELD_COLUMNS] + [now, now])
+        if not rows:
+            return 0
+
+        columns = [col for _, col in FIELD_COLUMNS] + ["first_seen", "last_seen"]
+        updates = ", ".join(f"{col}=excluded.{col}" for col in columns
+                            if col not in ("shop_id", "first_seen"))
+        sql = (f"INSERT INTO merchants ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))}) "
+               f"ON CONFLICT(shop_id) DO UPDATE SET {updates}")
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(sql, rows)
+        return len(rows)
+
+    def count(self):
+        """库中店铺数量"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM merchants").fetchone()[0]
+
+    def snapshot(self):
+        """读取当前全部店铺，返回DataFrame（数据库列名）"""
+        import pandas as pd
+
+        with self._lock:
+            return pd.read_sql_query("SELECT * FROM merchants ORDER BY shop_id", self._conn)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def snapshot_frame(store, indicators=None):
+    """
+    按TOPSIS.py和Cluster Map.py需要的列布局整理当前店铺快照
+    :param store: MerchantStore
+    :param indicators: 额外指标（如回头客、总评论数、平均情感得分），需含"店铺ID"列，按店铺ID拼接在后面
+    :return: DataFrame
+    """
+    import pandas as pd
+
+    df = store.snapshot()
+    export_df = df[[col for col, _ in EXPORT_COLUMNS]].rename(columns=dict(EXPORT_COLUMNS))
+    # 指标列必须是数值，"暂无数据"等文本转为空值
+    for col in ["总评分", "人均（元）"]:
+        export_df[col] = pd.to_numeric(export_df[col], errors="coerce")
+    if indicators is not None:
+        export_df = export_df.merge(indicators, on="店铺ID", how="left")
+    return export_df
+
+
+def export_snapshot(store, save_path, indicators=None):
+    """
+    按TOPSIS.py和Cluster Map.py需要的列布局导出当前店铺快照
+    :param store: MerchantStore
+    :param save_path: 导出路径（.xlsx或.csv）
+    :param indicators: 额外指标，同snapshot_frame
+    :return: 导出的DataFrame
+    """
+    export_df = snapshot_frame(store, indicators)
+    if save_path.endswith(".csv"):
+        export_df.to_csv(save_path, index=False, encoding="utf-8-sig")
+    else:
+        export_df.to_excel(save_path, index=False)
+    print(f"已导出 {len(export_df)} 家店铺到：{save_path}")
+    return export_df
+
+
+if __name__ == "__main__":
+    # 店铺库路径
+    DB_PATH = os.path.join(os.path.expanduser("~"), "美团店铺", "merchants.db")
+    # 导出路径
+    EXPORT_PATH = "./店铺数据.xlsx"
+    merchant_store = MerchantStore(DB_PATH)
+    export_snapshot(merchant_store, EXPORT_PATH)
+    merchant_store.close()
@@ -0,0 +1,125 @@
+import os
+import json
+import socket
+import struct
+import argparse
+import tempfile
+import socketserver
+
+# 常驻进程监听的Unix套接字路径
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "meituan_nlp.sock")
+# 消息格式：4字节大端长度 + UTF-8 JSON
+HEADER = struct.Struct(">I")
+
+
+def _send(sock, obj):
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv(sock):
+    (length,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    return json.loads(_recv_exact(sock, length).decode("utf-8"))
+
+
+def local_sentiments(texts, workers=1, pool=None):
+    """在当前进程中批量情感打分（空文本为None）"""
+    from batch_sentiment import batch_sentiments
+
+    return batch_sentiments(texts, workers=workers, pool=pool)
+
+
+def local_segments(texts):
+    """在当前进程中用jieba分词，返回每条文本的词列表"""
+    import jieba
+
+    return [jieba.lcut(t) if t else [] for t in texts]
+
+
+def remote_call(op, texts, socket_path=DEFAULT_SOCKET, timeout=600):
+    """
+    请求常驻进程处理一批文本
+    :return: 结果列表；常驻进程未运行（或系统不支持Unix套接字）时返回None
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            _send(sock, {"op": op, "texts": list(texts)})
+            reply = _recv(sock)
+    except OSError:
+        return None
+    if "error" in reply:
+        raise RuntimeError(f"常驻进程处理失败：{reply['error']}")
+    return reply["result"]
+
+
+def sentiments(texts, workers=1, socket_path=DEFAULT_SOCKET, pool=None):
+    """情感打分：常驻进程在运行时交给它，否则在当前进程计算（可作为cached_sentiments的batch_scorer）"""
+    texts = ["" if t is None else str(t) for t in texts]
+    result = remote_call("sentiment", texts, socket_path)
+    return result if result is not None else local_sentiments(texts, workers=workers, pool=pool)
+
+
+def segments(texts, socket_path=DEFAULT_SOCKET):
+    """jieba分词：常驻进程在运行时交给它，否则在当前进程计算"""
+    texts = ["" if t is None else str(t) for t in texts]
+    result = remote_call("segment", texts, socket_path)
+    return result if result is not None else local_segments(texts)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            request = _recv(self.request)
+            op, texts = request["op"], request["texts"]
+            if op == "sentiment":
+                result = local_sentiments(texts)
+            elif op == "segment":
+                result = local_segments(texts)
+            elif op == "ping":
+                result = []
+            else:
+                raise ValueError(f"未知操作：{op}")
+            _send(self.request, {"result": result})
+        except Exception as e:
+            _send(self.request, {"error": str(e)})
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path=DEFAULT_SOCKET):
+    """启动常驻进程：预先加载jieba词典和SnowNLP情感模型，然后一直等待请求"""
+    import jieba
+
+    jieba.initialize()
+    local_sentiments(["预热"])
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with _Server(socket_path, _Handler) as server:
+        print(f"NLP常驻进程已启动：{socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="常驻的分词/情感分析进程，避免每次运行脚本都重新加载模型")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix套接字路径")
+    args = parser.parse_args()
+    serve(args.socket)
@@ -0,0 +1,95 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from sentiment_cache import snownlp_sentiment
+
+
+# 每个子进程内使用的打分函数，由_init_worker设置
+_worker_scorer = None
+
+
+def _init_worker(scorer):
+    """子进程初始化：只加载一次SnowNLP模型（导入时加载分词和情感模型）"""
+    global _worker_scorer
+    _worker_scorer = scorer
+    # 先打一次分，触发模型加载
+    scorer("预热")
+
+
+def _score_chunk(texts):
+    return [_worker_scorer(t) for t in texts]
+
+
+def default_workers():
+    """默认进程数：CPU核数"""
+    return os.cpu_count() or 1
+
+
+def _map_chunk(func, texts):
+    return [func(t) for t in texts]
+
+
+class WorkerPool:
+    """
+    一次运行中复用的进程池：第一次需要并行时才启动，之后每个文件、每个分块都用同一组子进程，
+    子进程中的模型（SnowNLP、jieba词典）只在第一次用到时加载一次
+    用法：with WorkerPool(workers) as pool: score_texts(texts, scorer, pool=pool)
+    :param workers: 进程数，None为CPU核数，1为不开进程池（在当前进程计算）
+    """
+
+    def __init__(self, workers=None, chunk_size=1000):
+        self.workers = workers or default_workers()
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def map(self, func, texts, chunk_size=None):
+        """对每条文本调用func（模块级函数或其partial），按原顺序返回结果"""
+        texts = list(texts)
+        chunk_size = chunk_size or self.chunk_size
+        if self.workers <= 1 or len(texts) <= chunk_size:
+            return [func(t) for t in texts]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        results = []
+        for chunk_results in self._executor.map(_map_chunk, [func] * len(chunks), chunks):
+            results.extend(chunk_results)
+        return results
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def score_texts(texts, scorer=snownlp_sentiment, workers=None, chunk_size=1000, pool=None):
+    """
+    多进程情感打分：把文本切成若干块分给进程池，按原顺序拼回结果
+    :param texts: 文本列表（可以来自多个文件）
+    :param scorer: 单条文本的打分函数，必须是模块级函数（可被子进程导入）
+    :param workers: 进程数，None为CPU核数，1为不开进程池
+    :param chunk_size: 每块的文本条数
+    :param pool: WorkerPool，给出时使用其中已启动的子进程（workers不再起作用）；否则本次调用临时开一个进程池
+    :return: 与texts对齐的得分列表
+    """
+    if pool is not None:
+        return pool.map(scorer, texts, chunk_size)
+    texts = list(texts)
+    workers = workers or default_workers()
+    if workers <= 1 or len(texts) <= chunk_size:
+        return [scorer(t) for t in texts]
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    scores = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                             initializer=_init_worker, initargs=(scorer,)) as executor:
+        # map按提交顺序返回，结果顺序与输入一致
+        for chunk_scores in executor.map(_score_chunk, chunks):
+            scores.extend(chunk_scores)
+    return scores
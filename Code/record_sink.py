@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+
+# pyarrow为可选依赖：安装后写Parquet/Arrow，否则退回JSONL
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+    pq = None
+    ipc = None
+
+
+# 评论数据的列定义（列名, 类型）
+COMMENT_COLUMNS = [
+    ("用户名", "string"),
+    ("评分", "float64"),
+    ("评论内容", "string"),
+    ("评论时间", "string"),
+    ("店铺ID", "string"),
+]
+
+# 各格式对应的文件后缀
+FILE_SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow", "jsonl": ".jsonl"}
+
+
+def _arrow_type(type_name):
+    """把列定义中的类型名转换为pyarrow类型"""
+    return {
+        "string": pa.string(),
+        "float64": pa.float64(),
+        "int64": pa.int64(),
+        "bool": pa.bool_(),
+    }[type_name]
+
+
+class BufferedSink:
+    """
+    缓冲写入器：记录先追加到内存批次，达到行数或时间间隔后一次性写出
+    每次写出生成一个新的分片文件（只追加、不改写），适合长时间抓包
+    :param output_dir: 分片文件所在文件夹
+    :param columns: 列定义列表 [(列名, 类型), ...]
+    :param file_format: "parquet" / "arrow" / "jsonl" / "auto"（有pyarrow用parquet，否则jsonl）
+    :param flush_rows: 缓冲行数达到该值时写出
+    :param flush_interval: 距上次写出超过该秒数时写出
+    :param on_flush: 分片文件写完（已改名）后调用，参数为本次写出的记录列表，可选
+    """
+
+    def __init__(self, output_dir, columns, file_format="auto", flush_rows=500,
+                 flush_interval=10.0, prefix="part", on_flush=None):
+        if file_format == "auto":
+            file_format = "parquet" if pa is not None else "jsonl"
+        if file_format not in FILE_SUFFIXES:
+            raise ValueError(f"不支持的文件格式：{file_format}")
+        if file_format != "jsonl" and pa is None:
+            raise ValueError(f"写入{file_format}格式需要安装pyarrow")
+
+        self.output_dir = output_dir
+        self.columns = list(columns)
+        self.column_names = [name for name, _ in self.columns]
+        self.file_format = file_format
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.prefix = prefix
+        self.on_flush = on_flush
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._seq = 0
+        # 同一进程中的多个写入器（如每次回放新建一个）在同一秒写出时，靠随机标记区分文件名
+        self._token = uuid.uuid4().hex[:8]
+        os.makedirs(output_dir, exist_ok=True)
+
+        if file_format != "jsonl":
+            self._schema = pa.schema([(name, _arrow_type(t)) for name, t in self.columns])
+
+    def append(self, records):
+        """追加一批记录（字典列表），必要时触发写出，返回本次写出的行数"""
+        with self._lock:
+            self._buffer.extend(records)
+            if (len(self._buffer) >= self.flush_rows
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                return self._flush_locked()
+        return 0
+
+    def flush(self):
+        """立即写出缓冲区中的全部记录"""
+        with self._lock:
+            return self._flush_locked()
+
+    def close(self):
+        """写出剩余记录"""
+        return self.flush()
+
+    def _next_path(self):
+        # 文件名包含时间戳、进程号、写入器的随机标记和序号，多个进程或多个写入器同时写也不会冲突
+        self._seq += 1
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        name = (f"{self.prefix}-{stamp}-{os.getpid()}-{self._token}-{self._seq:06d}"
+                f"{FILE_SUFFIXES[self.file_format]}")
+        return os.path.join(self.output_dir, name)
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+
+        path = self._next_path()
+        tmp_path = path + ".tmp"
+        try:
+            self._write_file(rows, tmp_path)
+            # 写完再改名，读取方不会读到写了一半的分片
+            os.replace(tmp_path, path)
+        except Exception:
+            # 写出失败时记录放回缓冲区，下次写出时重试
+            self._buffer[:0] = rows
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.on_flush is not None:
+            self.on_flush(rows)
+        return len(rows)
+
+    def _write_file(self, rows, path):
+        if self.file_format == "jsonl":
+            with open(path, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({c: row.get(c) for c in self.column_names}, ensure_ascii=False))
+                    f.write("\n")
+        else:
+            table = pa.Table.from_pydict(
+                {c: [row.get(c) for row in rows] for c in self.column_names},
+                schema=self._schema,
+            )
+            if self.file_format == "parquet":
+                pq.write_table(table, path)
+            else:
+                with ipc.new_file(path, self._schema) as writer:
+                    writer.write_table(table)
+
+
+def read_sink(output_dir):
+    """把文件夹中的全部分片读取为一个DataFrame（按文件名即写出顺序拼接）"""
+    import pandas as pd
+
+    frames = []
+    for name in sorted(os.listdir(output_dir)):
+        path = os.path.join(output_dir, name)
+        if name.endswith(".parquet"):
+            frames.append(pd.read_parquet(path))
+        elif name.endswith(".arrow"):
+            with ipc.open_file(path) as reader:
+                frames.append(reader.read_pandas())
+        elif name.endswith(".jsonl"):
+            frames.append(pd.read_json(path, lines=True, dtype=False))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
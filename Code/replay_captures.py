@@ -0,0 +1,125 @@
+import os
+import re
+import json
+import time
+import base64
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from record_sink import BufferedSink, COMMENT_COLUMNS
+from merchant_store import MerchantStore
+from comment_dedup import CommentDedupIndex, raw_comment_key
+from response_parser import extract_shop_id, iter_raw_comments, parse_comment, parse_base_info
+
+
+def load_units(source):
+    """
+    读取待回放的响应，返回 (名称, 请求URL, 文件路径, 响应文本) 列表
+    目录：每个.json文件是一个响应，只记录路径，由子进程自行读取
+    HAR：每个entry是一个响应，URL取自请求
+    """
+    units = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".json"):
+                units.append((name, None, os.path.join(source, name), None))
+        return units
+
+    with open(source, "r", encoding="utf-8") as f:
+        har = json.load(f)
+    for i, entry in enumerate(har["log"]["entries"]):
+        content = entry.get("response", {}).get("content", {})
+        text = content.get("text")
+        if not text:
+            continue
+        if content.get("encoding") == "base64":
+            text = base64.b64decode(text).decode("utf-8", errors="replace")
+        units.append((f"entry{i}", entry.get("request", {}).get("url"), None, text))
+    return units
+
+
+def shop_id_from_name(name):
+    """目录回放时从文件名开头的数字取店铺ID，例如 123456_page2.json"""
+    match = re.match(r"(\d+)", name)
+    return match.group(1) if match else None
+
+
+def parse_unit(unit):
+    """
+    子进程：解析一个响应
+    :return: (名称, [(评论指纹, 评论记录)], [店铺记录], 错误信息)
+    """
+    name, url, path, text = unit
+    try:
+        if text is None:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        shop_id = extract_shop_id(url) if url else shop_id_from_name(name)
+
+        # 按解析后的顶层字段判断响应类型：评论页顶层有comments，详情页为data.baseInfo
+        # （不能在文本中查找子串，详情页内嵌套的"comments"字段会被误判为评论页）
+        body = json.loads(text)
+        if not isinstance(body, dict):
+            return name, [], [], None
+        if "comments" in body:
+            comments = [(raw_comment_key(shop_id, c), parse_comment(c, shop_id))
+                        for c in iter_raw_comments(body)]
+            return name, comments, [], None
+        data = body.get("data")
+        if isinstance(data, dict) and "baseInfo" in data:
+            return name, [], [parse_base_info(data["baseInfo"])], None
+        return name, [], [], None
+    except Exception as e:
+        return name, [], [], str(e)
+
+
+def replay(source, sink_dir, db_path=None, dedup_path=None, workers=None, chunksize=16):
+    """
+    用进程池解析抓包存档，评论写入与抓包脚本相同的分片目录，店铺信息写入店铺库
+    :return: 统计信息字典
+    """
+    start = time.perf_counter()
+    units = load_units(source)
+    sink = BufferedSink(sink_dir, COMMENT_COLUMNS, flush_rows=50000, flush_interval=float("inf"))
+    store = MerchantStore(db_path) if db_path else None
+    dedup = CommentDedupIndex(dedup_path) if dedup_path else None
+
+    stats = {"responses": len(units), "comments": 0, "duplicates": 0, "merchants": 0, "errors": 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for name, comments, merchants, error in executor.map(parse_unit, units, chunksize=chunksize):
+            if error:
+                stats["errors"] += 1
+                print(f"解析 {name} 失败：{error}")
+                continue
+            if dedup is not None and comments:
+                is_new = dedup.add_keys([key for key, _ in comments])
+                stats["duplicates"] += is_new.count(False)
+                comments = [pair for pair, new in zip(comments, is_new) if new]
+            sink.append([record for _, record in comments])
+            stats["comments"] += len(comments)
+            if store is not None and merchants:
+                stats["merchants"] += store.upsert_many(merchants)
+
+    sink.close()
+    if dedup is not None:
+        dedup.flush()
+    if store is not None:
+        store.close()
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 3)
+    print(f"回放完成：{stats}，约 {stats['responses'] / max(elapsed, 1e-9):.0f} 个响应/秒")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="离线回放抓包存档，重建评论和店铺数据")
+    parser.add_argument("source", help="保存JSON响应的文件夹，或HAR文件")
+    parser.add_argument("--sink-dir", default=os.path.join(os.path.expanduser("~"), "美团评论", "comments"),
+                        help="评论分片输出文件夹")
+    parser.add_argument("--db", default=None, help="店铺库路径（不填则不写店铺信息）")
+    parser.add_argument("--dedup", default=None, help="评论去重索引路径（不填则不去重）")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认CPU核数")
+    args = parser.parse_args()
+
+    replay(args.source, args.sink_dir, db_path=args.db, dedup_path=args.dedup, workers=args.workers)
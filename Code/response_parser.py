@@ -0,0 +1,184 @@
+import json
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+# 请求URL中表示店铺ID的参数名，按顺序查找
+SHOP_ID_PARAMS = ["shopId", "shopid", "poiId", "poiid", "mtShopId", "id"]
+# 请求URL中表示评论分页偏移量的参数名
+OFFSET_PARAMS = ["offset", "start"]
+# 评论接口中表示评论总数的字段名
+TOTAL_FIELDS = ["total", "totalCount", "commentCount"]
+
+
+# 从请求URL中解析店铺ID
+def extract_shop_id(url):
+    queries = parse_qs(urlparse(url).query)
+    for name in SHOP_ID_PARAMS:
+        if queries.get(name):
+            return queries[name][0]
+    return None
+
+
+# 从请求URL中解析评论分页偏移量
+def extract_page_offset(url):
+    queries = parse_qs(urlparse(url).query)
+    for name in OFFSET_PARAMS:
+        if queries.get(name):
+            try:
+                return int(queries[name][0])
+            except ValueError:
+                return None
+    return None
+
+
+# 从评论接口响应中读取评论总数
+def extract_comment_total(body):
+    for name in TOTAL_FIELDS:
+        try:
+            value = body[name]
+        except (KeyError, TypeError, IndexError):
+            continue
+        if isinstance(value, (int, float)):
+            return int(value)
+    return None
+
+
+# 时间戳转换函数
+def timestamp_to_datetime(ms_timestamp):
+    try:
+        sec_timestamp = ms_timestamp / 1000
+        dt = datetime.fromtimestamp(sec_timestamp)
+        return dt.strftime("%Y-%m-%d")
+    except Exception:
+        return "未知时间"
+
+
+# 合并评论的函数
+def merge_with_merchant_comment(original_content, merchant_comment):
+    merged = [f"原评论：{original_content}"]
+    if merchant_comment is not None:
+        reply_content = merchant_comment
+        merged.append(f"【商家回复】：{reply_content}")
+    return "\n".join(merged)
+
+
+def parse_comment(comment, shop_id=None):
+    """把接口返回的一条评论转换为评论记录（列与record_sink.COMMENT_COLUMNS一致）"""
+    # 如果有商家回复、其他用户回复，则和用户评论合并为一条评论
+    merge_comment = merge_with_merchant_comment(comment.get("commentBody"), comment.get("merchantComment"))
+    return {
+        "用户名": comment.get("userName"),
+        "评分": float(comment.get("star") or 0) / 10,
+        "评论内容": merge_comment,
+        "评论时间": timestamp_to_datetime(comment.get("modifyTime", 0)),
+        "店铺ID": None if shop_id is None else str(shop_id),
+    }
+
+
+def parse_base_info(baseinfo):
+    """把店铺详情接口的baseInfo转换为店铺记录（字段与merchant_store.FIELD_COLUMNS一致）"""
+    crumbs = baseinfo["crumbs"]
+
+    #平均价格
+    if baseinfo["avgPrice"] == 0:
+        shop_avgprice = "暂无数据"
+    else:
+        shop_avgprice = baseinfo.get("avgPrice")
+
+    #如果是Null，说明无停车位，用0表示
+    if baseinfo.get("park") is not None:
+        shop_park = 1
+    else:
+        shop_park = 0
+
+    #提取店铺分类
+    shop_class = " ， ".join(crumb.get("title", "") for crumb in crumbs)
+
+    # 分别获取经纬度，组合为字符串
+    lng = baseinfo.get("lng")
+    lat = baseinfo.get("lat")
+
+    return {
+        "店铺ID": baseinfo.get("id"),
+        "店铺名": baseinfo.get("name"),
+        "店铺分类": shop_class,
+        "评分": baseinfo.get("score"),
+        "人均（元）": shop_avgprice,
+        "最低消费（元）": baseinfo.get("lowestPrice"),
+        "店铺地址": baseinfo.get("address"),
+        "店铺经纬度": f"{lng},{lat}",
+        "营业时间": baseinfo.get("openTime"),
+        "WIFI": baseinfo.get("wifi"),  #如果是0，说明无WIFI
+        "停车位": shop_park,
+    }
+
+
+def _skip_ws(text, pos):
+    while pos < len(text) and text[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def _expect(text, pos, char):
+    pos = _skip_ws(text, pos)
+    if pos >= len(text) or text[pos] != char:
+        raise ValueError(f"JSON格式错误：位置{pos}处应为'{char}'")
+    return pos + 1
+
+
+def iter_json_array(text, key):
+    """
+    增量解析：在顶层JSON对象中找到key对应的数组，逐个元素解码并返回
+    只有当前元素会被构造成Python对象，大响应不会整体展开
+    """
+    pos = _expect(text, 0, "{")
+    pos = _skip_ws(text, pos)
+    if pos < len(text) and text[pos] == "}":
+        return
+    while True:
+        name, pos = _decoder.raw_decode(text, _skip_ws(text, pos))
+        pos = _expect(text, pos, ":")
+        pos = _skip_ws(text, pos)
+        if name == key:
+            if text.startswith("null", pos):
+                return
+            pos = _expect(text, pos, "[")
+            pos = _skip_ws(text, pos)
+            if pos < len(text) and text[pos] == "]":
+                return
+            while True:
+                item, pos = _decoder.raw_decode(text, _skip_ws(text, pos))
+                yield item
+                pos = _skip_ws(text, pos)
+                if pos < len(text) and text[pos] == ",":
+                    pos += 1
+                    continue
+                _expect(text, pos, "]")
+                return
+        # 跳过其他字段
+        _, pos = _decoder.raw_decode(text, pos)
+        pos = _skip_ws(text, pos)
+        if pos < len(text) and text[pos] == ",":
+            pos += 1
+            continue
+        _expect(text, pos, "}")
+        return
+
+
+def iter_raw_comments(source):
+    """从响应体中逐条取出原始评论：source可以是已解析的字典，也可以是JSON文本/字节"""
+    if isinstance(source, bytes):
+        source = source.decode("utf-8")
+    if isinstance(source, str):
+        yield from iter_json_array(source, "comments")
+    else:
+        yield from (source.get("comments") or [])
+
+
+def extract_comments(source, shop_id=None):
+    """从响应体中逐条提取评论记录"""
+    for comment in iter_raw_comments(source):
+        yield parse_comment(comment, shop_id)
@@ -0,0 +1,125 @@
+import os
+import json
+from functools import lru_cache, partial
+
+import numpy as np
+
+import nlp_service
+
+
+@lru_cache(maxsize=None)
+def _tokenizer(user_dict=None):
+    """每个进程每个用户词典只加载一次的jieba分词器"""
+    import jieba
+
+    if not user_dict:
+        return jieba.dt
+    tokenizer = jieba.Tokenizer()
+    tokenizer.initialize()
+    tokenizer.load_userdict(user_dict)
+    return tokenizer
+
+
+def cut_text(text, user_dict=None):
+    """单条文本分词（模块级函数，可交给进程池）"""
+    if not text:
+        return []
+    return _tokenizer(user_dict).lcut(text)
+
+
+def load_stopwords(path):
+    """读取停用词文件（每行一个词）"""
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class Vocabulary:
+    """
+    词表：词 <-> 整数ID，ID从0开始按首次出现的顺序分配
+    保存为JSON词列表，再次加载后已有词的ID不变，不同批次、不同文件的分词ID可以直接合并统计
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.words = []
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.words = json.load(f)
+        self.ids = {word: i for i, word in enumerate(self.words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def encode(self, tokens):
+        """词列表转换为int32的ID数组，新词追加到词表末尾"""
+        ids = self.ids
+        out = np.empty(len(tokens), dtype=np.int32)
+        for i, token in enumerate(tokens):
+            word_id = ids.get(token)
+            if word_id is None:
+                word_id = ids[token] = len(self.words)
+                self.words.append(token)
+            out[i] = word_id
+        return out
+
+    def save(self, path=None):
+        path = path or self.path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.words, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class Segmenter:
+    """
+    批量分词：用户词典和停用词只加载一次，整批文本去重后分词（可多进程），
+    同时给出以空格连接的分词结果和词ID数组（供词频统计直接使用，无需再拆分字符串）
+    :param user_dict: jieba用户词典路径（菜名、店铺用语等），None为只用默认词典
+    :param stopwords: 停用词文件路径，None为不过滤（分词结果与jieba.cut完全一致）
+    :param vocab: Vocabulary对象或词表文件路径，None为新建空词表
+    :param workers: 分词进程数，1为在当前进程分词，None为CPU核数
+    :param pool: parallel_sentiment.WorkerPool，给出时在其中分词，多次调用复用同一组子进程（workers不再起作用）
+    """
+
+    def __init__(self, user_dict=None, stopwords=None, vocab=None, workers=1, chunk_size=2000, pool=None):
+        self.user_dict = user_dict
+        self.stopwords = load_stopwords(stopwords) if stopwords else set()
+        self.vocab = vocab if isinstance(vocab, Vocabulary) else Vocabulary(vocab)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.pool = pool
+
+    def cut(self, texts):
+        """对一批文本分词，重复文本只分一次，返回与texts对齐的词列表"""
+        texts = ["" if t is None else str(t) for t in texts]
+        unique = list(dict.fromkeys(texts))
+        tokens = None
+        if self.user_dict is None:
+            # 常驻进程（nlp_service.py）使用默认词典，运行时交给它分词
+            tokens = nlp_service.remote_call("segment", unique)
+        if tokens is None:
+            if self.workers == 1 and self.pool is None:
+                tokens = [cut_text(t, self.user_dict) for t in unique]
+            else:
+                from parallel_sentiment import score_texts
+                tokens = score_texts(unique, partial(cut_text, user_dict=self.user_dict),
+                                     workers=self.workers, chunk_size=self.chunk_size, pool=self.pool)
+        if self.stopwords:
+            tokens = [[w for w in words if w not in self.stopwords] for words in tokens]
+        by_text = dict(zip(unique, tokens))
+        return [by_text[t] for t in texts]
+
+    def segment(self, texts):
+        """
+        对一批文本分词
+        :return: (分词结果列表, 词ID数组列表)，均与texts对齐
+        """
+        texts = ["" if t is None else str(t) for t in texts]
+        # 相同文本只拼接、转换一次
+        done = {}
+        for text, words in zip(texts, self.cut(texts)):
+            if text not in done:
+                done[text] = (" ".join(words), self.vocab.encode(words))
+        joined = [done[t][0] for t in texts]
+        ids = [done[t][1] for t in texts]
+        return joined, ids
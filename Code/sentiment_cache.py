@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import hashlib
+
+
+CREATE_SQL = [
+    "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE IF NOT EXISTS scores (key BLOB PRIMARY KEY, score REAL NOT NULL, used INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS scores_used ON scores (used)",
+]
+
+# SQLite单条语句的参数个数有上限，批量查询时分段
+QUERY_BATCH = 500
+
+
+def text_key(text):
+    """清洗后文本的内容哈希（16字节）"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def snownlp_model_tag():
+    """SnowNLP版本 + 情感模型文件哈希，模型更换或重新训练后缓存自动失效"""
+    from importlib.metadata import version, PackageNotFoundError
+    from importlib.util import find_spec
+
+    try:
+        snownlp_version = version("snownlp")
+    except PackageNotFoundError:
+        snownlp_version = "unknown"
+    # 只定位模型文件，不导入snownlp（导入时会加载全部模型，较慢）
+    package_dir = find_spec("snownlp").submodule_search_locations[0]
+    model_path = os.path.join(package_dir, "sentiment", "sentiment.marshal.3")
+    digest = hashlib.blake2b(digest_size=8)
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"snownlp-{snownlp_version}-{digest.hexdigest()}"
+
+
+def snownlp_sentiment(text):
+    """SnowNLP情感得分（未取整），空文本或分析失败返回None"""
+    from snownlp import SnowNLP
+
+    if not text or text.strip() == "":
+        return None
+    try:
+        return SnowNLP(text).sentiments
+    except Exception:
+        return None
+
+
+class SentimentCache:
+    """
+    情感得分的磁盘缓存（SQLite），以清洗后文本的哈希为键，清洗和NLP两个阶段共用
+    :param db_path: 缓存文件路径
+    :param model_tag: 模型版本标记，与缓存中记录的不一致时清空缓存；默认取snownlp_model_tag()
+    :param max_entries: 最多保留的条数，超出后淘汰最久未使用的记录
+    """
+
+    def __init__(self, db_path, model_tag=None, max_entries=2_000_000):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.model_tag = model_tag or snownlp_model_tag()
+
+        self._conn = sqlite3.connect(db_path)
+        for sql in CREATE_SQL:
+            self._conn.execute(sql)
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'model'").fetchone()
+        if row is None or row[0] != self.model_tag:
+            if row is not None:
+                print(f"情感模型已变化（{row[0]} -> {self.model_tag}），清空情感得分缓存")
+            self._conn.execute("DELETE FROM scores")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('model', ?)", (self.model_tag,))
+        # 每次打开缓存算一代，命中的记录标记为当前代，淘汰时先删最老的代
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()
+        self.generation = int(row[0]) + 1 if row else 1
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (str(self.generation),))
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def get_many(self, texts):
+        """批量查询，返回与texts对齐的得分列表，未命中为None"""
+        keys = [text_key(t) for t in texts]
+        found = {}
+        unique_keys = list(set(keys))
+        for i in range(0, len(unique_keys), QUERY_BATCH):
+            batch = unique_keys[i:i + QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._conn.execute(
+                f"SELECT key, score FROM scores WHERE key IN ({placeholders})", batch).fetchall())
+        if found:
+            with self._conn:
+                self._conn.executemany("UPDATE scores SET used = ? WHERE key = ?",
+                                       [(self.generation, k) for k in found])
+        return [found.get(k) for k in keys]
+
+    def put_many(self, texts, scores):
+        """批量写入得分（None不写入），超出容量时淘汰旧记录"""
+        rows = [(text_key(t), s, self.generation) for t, s in zip(texts, scores) if s is not None]
+        if not rows:
+            return 0
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)", rows)
+        self.evict()
+        return len(rows)
+
+    def evict(self):
+        """超出max_entries时删除最久未使用的记录"""
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY used LIMIT ?)", (excess,))
+        return max(excess, 0)
+
+    def close(self):
+        self._conn.close()
+
+
+def cached_sentiments(texts, cache=None, scorer=snownlp_sentiment, workers=1, batch_scorer=None, pool=None):
+    """
+    计算一批文本的情感得分（未取整），先查缓存，只对未命中的文本调用scorer
+    同一批中重复的文本只计算一次
+    :param workers: 未命中文本的打分进程数，1为在当前进程计算，None为CPU核数
+    :param batch_scorer: 批量打分函数 batch_scorer(texts, workers=..., pool=...)，例如batch_sentiment.batch_sentiments，给出时代替scorer
+    :param pool: parallel_sentiment.WorkerPool，多次调用复用同一个进程池（给出时workers不再起作用）
+    :return: 与texts对齐的得分列表，空文本或分析失败为None
+    """
+    texts = ["" if t is None else str(t) for t in texts]
+    scores = cache.get_many(texts) if cache is not None else [None] * len(texts)
+
+    missing = {}
+    for i, (text, score) in enumerate(zip(texts, scores)):
+        if score is None and text.strip():
+            missing.setdefault(text, []).append(i)
+    if missing:
+        new_texts = list(missing)
+        if batch_scorer is not None:
+            new_scores = batch_scorer(new_texts, workers=workers, pool=pool)
+        elif workers == 1 and pool is None:
+            new_scores = [scorer(t) for t in new_texts]
+        else:
+            from parallel_sentiment import score_texts
+            new_scores = score_texts(new_texts, scorer, workers=workers, pool=pool)
+        for text, score in zip(new_texts, new_scores):
+            for i in missing[text]:
+                scores[i] = score
+        if cache is not None:
+            cache.put_many(new_texts, new_scores)
+    return scores
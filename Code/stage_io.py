@@ -0,0 +1,153 @@
+import os
+import pandas as pd
+
+from excel_export import write_xlsx
+
+# pyarrow为可选依赖：安装后中间结果用Parquet；未安装时只能退回Excel
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+    pq = None
+
+
+# 中间结果的文件后缀
+STAGE_SUFFIX = ".parquet"
+
+# 清洗阶段输出的列类型
+CLEANED_DTYPES = {
+    "用户名": "category",
+    "评分": "float32",
+    "评论内容": "string",
+    "评论时间": "datetime64[ns]",
+    "情感得分": "float32",
+    "是否回头客": "bool",
+    "回头次数": "int32",
+}
+
+# NLP阶段在清洗结果上追加的列类型
+ANALYZED_DTYPES = dict(CLEANED_DTYPES, **{
+    "清理后评论": "string",
+    "分词结果": "string",
+})
+
+# 只保存在中间结果中、不导出到Excel的列（词ID数组）
+EXCEL_SKIP_COLUMNS = ["分词ID"]
+
+# 导出Excel时评论时间的格式（与原来的清洗结果一致）
+DATE_FORMAT = "%Y/%m/%d"
+
+
+def stage_path(folder, file_name):
+    """输入文件对应的中间结果路径（同名，后缀改为.parquet；未安装pyarrow时为.xlsx）"""
+    base, _ = os.path.splitext(file_name)
+    return os.path.join(folder, base + (STAGE_SUFFIX if pyarrow is not None else ".xlsx"))
+
+
+def apply_dtypes(df, dtypes):
+    """
+    按列类型表转换df中存在的列（评论时间可以是'%Y/%m/%d'字符串或日期）
+    文本列（category、string）先把非空值统一转为字符串：Excel中纯数字的用户名、店铺ID读出来是int，
+    与文本混在一列（或在不同分块中类型不同）时pyarrow无法写出
+    """
+    df = df.copy()
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            continue
+        if dtype.startswith("datetime64"):
+            values = df[column]
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                values = pd.to_datetime(values, format=DATE_FORMAT, errors="coerce")
+            df[column] = values.astype(dtype)
+        elif dtype in ("category", "string"):
+            values = df[column]
+            if values.dtype == object or pd.api.types.is_numeric_dtype(values):
+                values = values.where(values.isna(), values.astype(str))
+            df[column] = values.astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def write_stage(df, path, dtypes):
+    """按列类型写出Parquet中间结果（先写临时文件再替换，中断时不会留下半个文件）；路径不是.parquet时导出Excel"""
+    if not path.endswith(STAGE_SUFFIX):
+        export_excel(df, path)
+        return
+    tmp_path = path + ".tmp"
+    apply_dtypes(df, dtypes).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _stage_schema(df, dtypes):
+    """按第一块推断pyarrow表结构；分类列的编码统一用int32，各块的字典编码宽度不同也能写入同一文件"""
+    schema = pyarrow.Schema.from_pandas(df, preserve_index=False)
+    for i, name in enumerate(schema.names):
+        if dtypes.get(name) == "category":
+            schema = schema.set(i, pyarrow.field(name, pyarrow.dictionary(pyarrow.int32(), pyarrow.string())))
+    return schema
+
+
+class StageWriter:
+    """
+    分块写出中间结果：每块转换列类型后追加到同一个Parquet文件，内存中只保留当前块
+    未安装pyarrow时退回为关闭时一次性导出Excel
+    """
+
+    def __init__(self, path, dtypes):
+        self.path = path
+        self.dtypes = dtypes
+        self.rows = 0
+        self._tmp_path = path + ".tmp"
+        self._writer = None
+        self._schema = None
+        self._chunks = []
+
+    def write(self, df):
+        self.rows += len(df)
+        if not self.path.endswith(STAGE_SUFFIX):
+            self._chunks.append(df)
+            return
+        df = apply_dtypes(df, self.dtypes)
+        if self._writer is None:
+            self._schema = _stage_schema(df, self.dtypes)
+            self._writer = pq.ParquetWriter(self._tmp_path, self._schema)
+        self._writer.write_table(pyarrow.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+    def close(self):
+        """写完后把临时文件替换为正式文件"""
+        if not self.path.endswith(STAGE_SUFFIX):
+            if self._chunks:
+                export_excel(pd.concat(self._chunks, ignore_index=True), self.path)
+                self._chunks = []
+            return
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.replace(self._tmp_path, self.path)
+
+
+def read_stage(path, columns=None):
+    """读取中间结果；兼容旧的Excel中间结果（评论时间转换为日期）"""
+    if path.endswith(STAGE_SUFFIX):
+        return pd.read_parquet(path, columns=columns)
+    df = pd.read_excel(path, usecols=columns)
+    if "评论时间" in df.columns:
+        df["评论时间"] = pd.to_datetime(df["评论时间"], format=DATE_FORMAT, errors="coerce")
+    return df
+
+
+def stage_files(folder):
+    """文件夹中的中间结果文件：优先.parquet，同名的.xlsx/.xls（旧流程的结果或Excel导出）只在没有.parquet时使用"""
+    names = sorted(f for f in os.listdir(folder) if f.endswith((STAGE_SUFFIX, ".xlsx", ".xls")))
+    parquet_bases = {os.path.splitext(f)[0] for f in names if f.endswith(STAGE_SUFFIX)}
+    return [f for f in names if f.endswith(STAGE_SUFFIX) or os.path.splitext(f)[0] not in parquet_bases]
+
+
+def export_excel(df, path):
+    """最终导出为Excel（一次写出，列宽预先算好）：评论时间按原来的'%Y/%m/%d'格式写成字符串，不导出词ID数组"""
+    df = df.drop(columns=[c for c in EXCEL_SKIP_COLUMNS if c in df.columns])
+    if "评论时间" in df.columns and pd.api.types.is_datetime64_any_dtype(df["评论时间"]):
+        df["评论时间"] = df["评论时间"].dt.strftime(DATE_FORMAT)
+    write_xlsx(df, path)
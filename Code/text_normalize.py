@@ -0,0 +1,62 @@
+import re
+import pandas as pd
+
+
+# 整列拼接时使用的分隔符：两套规则都会删除它，所以原文中不会残留
+SEP = "\x00"
+
+# []标记的表情符号，例如[呲牙]（与 \[.*?\] 等价，且不会跨过分隔符匹配到下一条评论）
+EMOJI_PATTERN = re.compile(r'\[[^\]\n\x00]*\]')
+
+# Comment Info Cleaning.py：中文、英文、数字、空格和常见中英文标点
+# 中文标点：。，！？；："'（）《》【】·
+# 英文标点：.,!?;:'"(){}[]
+CLEANING_DROP_PATTERN = re.compile(
+    r'[^\x00\u4e00-\u9fa5a-zA-Z0-9\s。，！？；："\'（）《》【】·\.\,\!\?\;\:\'\"\(\)\{\}\[\]］]+')
+# Comment NLP Sentiment Analysis.py：中文、常见标点、空格、字母数字
+NLP_DROP_PATTERN = re.compile(r'[^\x00\u4e00-\u9fa5，。！？；：\s\w]+')
+
+
+def _join_column(series):
+    # 空值转为空字符串，其他值统一转为字符串，再用分隔符拼成一个长字符串
+    items = series.astype(object).where(series.notna(), "").tolist()
+    text = SEP.join(map(str, items))
+    if text.count(SEP) != max(len(items) - 1, 0):
+        # 原文中含有分隔符字符，先删掉（两套规则本来也会删除它）
+        text = SEP.join(str(item).replace(SEP, "") for item in items)
+    return text
+
+
+def _split_column(text, series, collapse_spaces):
+    # 拆回每条评论并去掉首尾空白；collapse_spaces时连续空白合并为一个空格（与 re.sub(r'\s+', ' ') 等价）
+    if not len(series):
+        items = []
+    elif collapse_spaces:
+        items = [" ".join(item.split()) for item in text.split(SEP)]
+    else:
+        items = [item.strip() for item in text.split(SEP)]
+    return pd.Series(items, index=series.index, dtype=object)
+
+
+def clean_comments(series):
+    """
+    清洗整列评论内容（Comment Info Cleaning.py的规则）：去掉[]表情，只保留中英文字符和中英文标点，合并多余空格
+    整列拼成一个字符串后每个正则只执行一次，结果与逐条清洗完全一致
+    """
+    text = _join_column(series)
+    text = EMOJI_PATTERN.sub('', text)
+    text = CLEANING_DROP_PATTERN.sub('', text)
+    return _split_column(text, series, collapse_spaces=True)
+
+
+def clean_for_nlp(series):
+    """清洗整列评论内容（Comment NLP Sentiment Analysis.py的规则）：去掉[]表情，保留中文、常见标点、空格、字母数字"""
+    text = _join_column(series)
+    text = EMOJI_PATTERN.sub('', text)
+    text = NLP_DROP_PATTERN.sub('', text)
+    return _split_column(text, series, collapse_spaces=False)
+
+
+def clean_text(text):
+    """清洗单条评论内容（clean_comments的逐条版本）"""
+    return clean_comments(pd.Series([text])).iloc[0]
@@ -0,0 +1,237 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from excel_stream import iter_excel_chunks
+from stage_io import STAGE_SUFFIX, StageWriter
+from topsis_engine import indicator_masks, standardize
+
+# 贴近度保留3位小数，排名按取整后的贴近度计算：每个分类用 0~1000 的直方图即可得到精确名次
+CLOSENESS_BINS = 1001
+
+
+def iter_table_chunks(path, chunk_rows=100000, sheet_name=None):
+    """分块读取店铺表：.csv用read_csv，.parquet按行组批次读取，其余按Excel只读模式逐行读取"""
+    if path.endswith(".csv"):
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+    elif path.endswith(STAGE_SUFFIX):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from iter_excel_chunks(path, chunk_rows, sheet_name=sheet_name)
+
+
+def _segment_reduce(ufunc, values, gid):
+    """按组号对一块数据做分组归约，返回 (出现的组号, 各组结果)"""
+    order = np.argsort(gid, kind="stable")
+    groups, starts = np.unique(gid[order], return_index=True)
+    return groups, ufunc.reduceat(values[order], starts, axis=0)
+
+
+class ChunkedTopsis:
+    """
+    分块熵权TOPSIS：店铺表按块多次扫描，内存只与块大小和分类数有关
+    第1遍：各分类各指标的最小值、最大值和店铺数
+    第2遍：标准化后各分类的 Σy、Σy·ln y 和y的最大/最小值，得到熵权和正负理想解
+          （Σp·ln p = Σy·ln y / S − ln S，其中 S = Σy，不需要保留整列数据）
+    第3遍：计算贴近度，统计各分类取整后贴近度的直方图，得到精确的组内名次
+    第4遍：再算一次距离和贴近度，按直方图查出名次，逐块写出结果
+    """
+
+    def __init__(self, category_col, indicator_start_col, positive_indices, negative_indices):
+        self.category_col = category_col
+        self.indicator_start_col = indicator_start_col
+        self.positive_indices = positive_indices
+        self.negative_indices = negative_indices
+        self.keys = {}
+        self.columns = None
+
+    def _chunk_arrays(self, chunk, add_keys=False):
+        """一块数据的 (有效行掩码, 组号, 指标矩阵)；分类为空的行与groupby一样不参与计算"""
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        categories = chunk[self.category_col]
+        valid = categories.notna().to_numpy()
+        gid = np.empty(len(chunk), dtype=np.int64)
+        for i, key in enumerate(categories.to_numpy()):
+            if not valid[i]:
+                continue
+            code = self.keys.get(key)
+            if code is None:
+                if not add_keys:
+                    raise ValueError(f"分类 {key} 在第一遍扫描中不存在（数据在两遍之间被修改？）")
+                code = self.keys[key] = len(self.keys)
+            gid[i] = code
+        data = chunk.iloc[:, self.indicator_start_col:].to_numpy()
+        if not np.issubdtype(data.dtype, np.number):
+            raise ValueError("指标列包含非数值数据")
+        return valid, gid[valid], data[valid]
+
+    def _grow(self, array, fill):
+        """分类数增加时扩展按分类保存的统计量"""
+        extra = len(self.keys) - len(array)
+        if extra <= 0:
+            return array
+        pad = np.full((extra,) + array.shape[1:], fill, dtype=array.dtype)
+        return np.concatenate([array, pad])
+
+    def first_pass(self, chunks):
+        """第1遍：各分类各指标的最小值、最大值和店铺数"""
+        self.min_val = self.max_val = self.sizes = None
+        for chunk in chunks:
+            _, gid, data = self._chunk_arrays(chunk, add_keys=True)
+            m = data.shape[1]
+            if self.min_val is None:
+                self.min_val = np.zeros((0, m))
+                self.max_val = np.zeros((0, m))
+                self.sizes = np.zeros(0, dtype=np.int64)
+            self.min_val = self._grow(self.min_val, np.inf)
+            self.max_val = self._grow(self.max_val, -np.inf)
+            self.sizes = self._grow(self.sizes, 0)
+            if len(gid) == 0:
+                continue
+            groups, chunk_min = _segment_reduce(np.minimum, data, gid)
+            self.min_val[groups] = np.minimum(self.min_val[groups], chunk_min)
+            groups, chunk_max = _segment_reduce(np.maximum, data, gid)
+            self.max_val[groups] = np.maximum(self.max_val[groups], chunk_max)
+            self.sizes += np.bincount(gid, minlength=len(self.sizes))
+        self.positive, self.negative = indicator_masks(self.min_val.shape[1], self.positive_indices,
+                                                       self.negative_indices)
+
+    def _standardize(self, gid, data):
+        return standardize(data, self.min_val[gid], self.max_val[gid], self.positive, self.negative)
+
+    def second_pass(self, chunks):
+        """第2遍：熵权和正负理想解"""
+        n_groups, m = self.min_val.shape
+        y_sum = np.zeros((n_groups, m))
+        ylogy_sum = np.zeros((n_groups, m))
+        y_max = np.full((n_groups, m), -np.inf)
+        y_min = np.full((n_groups, m), np.inf)
+        for chunk in chunks:
+            _, gid, data = self._chunk_arrays(chunk)
+            if len(gid) == 0:
+                continue
+            y = self._standardize(gid, data)
+            groups, sums = _segment_reduce(np.add, np.concatenate([y, y * np.log(y)], axis=1), gid)
+            y_sum[groups] += sums[:, :m]
+            ylogy_sum[groups] += sums[:, m:]
+            groups, chunk_max = _segment_reduce(np.maximum, y, gid)
+            y_max[groups] = np.maximum(y_max[groups], chunk_max)
+            groups, chunk_min = _segment_reduce(np.minimum, y, gid)
+            y_min[groups] = np.minimum(y_min[groups], chunk_min)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            plogp_sum = ylogy_sum / y_sum - np.log(y_sum)
+            e = -plogp_sum / np.log(self.sizes)[:, None]
+            g = 1 - e
+            self.weights = g / np.sum(g, axis=1, keepdims=True)
+        # 权重非负时加权后的最大/最小值就是y的最大/最小值乘以权重
+        w = self.weights
+        self.z_positive = np.where(w >= 0, y_max * w, y_min * w)
+        self.z_negative = np.where(w >= 0, y_min * w, y_max * w)
+
+    def _closeness(self, gid, data):
+        weighted = self._standardize(gid, data) * self.weights[gid]
+        d_positive = np.sqrt(np.sum((weighted - self.z_positive[gid]) ** 2, axis=1))
+        d_negative = np.sqrt(np.sum((weighted - self.z_negative[gid]) ** 2, axis=1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            closeness = d_negative / (d_positive + d_negative)
+        return d_positive, d_negative, closeness
+
+    def third_pass(self, chunks):
+        """第3遍：各分类取整贴近度的直方图 -> 每个取值对应的名次（并列取最小名次）"""
+        n_groups = len(self.sizes)
+        hist = np.zeros(n_groups * CLOSENESS_BINS, dtype=np.int64)
+        for chunk in chunks:
+            _, gid, data = self._chunk_arrays(chunk)
+            if len(gid) == 0:
+                continue
+            closeness = self._closeness(gid, data)[2]
+            bad = np.isnan(closeness)
+            if bad.any():
+                names = list(self.keys)
+                raise ValueError(f"分类 {sorted({names[g] for g in gid[bad]})} 的贴近度无法计算（店铺数过少或指标无差异）")
+            bins = np.rint(closeness * 1000).astype(np.int64)
+            hist += np.bincount(gid * CLOSENESS_BINS + bins, minlength=len(hist))
+        hist = hist.reshape(n_groups, CLOSENESS_BINS)
+        # 名次 = 1 + 组内贴近度更高的店铺数
+        higher = np.cumsum(hist[:, ::-1], axis=1)[:, ::-1] - hist
+        self.rank_table = higher + 1
+
+    def fourth_pass(self, chunks, writer):
+        """第4遍：逐块计算距离、贴近度和名次并写出"""
+        rows = 0
+        for chunk in chunks:
+            valid, gid, data = self._chunk_arrays(chunk)
+            if len(gid) == 0:
+                continue
+            d_positive, d_negative, closeness = self._closeness(gid, data)
+            closeness = closeness.round(3)
+            result = chunk.loc[valid, self.columns[:self.indicator_start_col]].reset_index(drop=True)
+            result["到正理想解距离"] = d_positive.round(3)
+            result["到负理想解距离"] = d_negative.round(3)
+            result["贴近度"] = closeness
+            result["排名"] = self.rank_table[gid, np.rint(closeness * 1000).astype(np.int64)]
+            writer(result)
+            rows += len(result)
+        return rows
+
+
+def chunked_topsis(input_path, output_path, category_col, indicator_start_col, positive_indices,
+                   negative_indices, chunk_rows=100000, sheet_name=None):
+    """
+    对超过内存的店铺表分块计算熵权TOPSIS排名，结果逐块写出（.parquet或.csv）
+    输出行保持输入顺序（不按分类、名次排序），其余列与TOPSIS.py的排名结果相同
+    :return: 写出的行数
+    """
+    ranker = ChunkedTopsis(category_col, indicator_start_col, positive_indices, negative_indices)
+    chunks = lambda: iter_table_chunks(input_path, chunk_rows, sheet_name)
+
+    ranker.first_pass(chunks())
+    print(f"第1遍完成：{len(ranker.keys)} 个分类，{int(ranker.sizes.sum())} 家店铺")
+    ranker.second_pass(chunks())
+    print("第2遍完成：已得到各分类的熵权和正负理想解")
+    ranker.third_pass(chunks())
+    print("第3遍完成：已得到各分类的名次表")
+
+    if output_path.endswith(STAGE_SUFFIX):
+        # 店铺ID、名称等信息列按文本写出：各块的列类型由单元格决定（个别ID存成文本），不固定时后面的块无法写入
+        info_dtypes = {column: "string" for column in ranker.columns[:indicator_start_col]}
+        writer = StageWriter(output_path, info_dtypes)
+        rows = ranker.fourth_pass(chunks(), writer.write)
+        writer.close()
+    else:
+        tmp_path = output_path + ".tmp"
+        header = [True]
+
+        def write_csv(result):
+            result.to_csv(tmp_path, mode="w" if header[0] else "a", header=header[0], index=False,
+                          encoding="utf-8-sig" if header[0] else "utf-8")
+            header[0] = False
+
+        rows = ranker.fourth_pass(chunks(), write_csv)
+        if not header[0]:
+            os.replace(tmp_path, output_path)
+    print(f"第4遍完成：排名结果已保存到 {output_path}（{rows} 行）")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="分块计算熵权TOPSIS排名（店铺表超过内存时使用）")
+    parser.add_argument("input", help="店铺表（.xlsx / .csv / .parquet）")
+    parser.add_argument("output", help="排名结果（.parquet或.csv）")
+    parser.add_argument("--category", default="店铺分类", help="分类列名")
+    parser.add_argument("--start-col", type=int, default=5, help="指标列起始位置索引")
+    parser.add_argument("--positive", type=int, nargs="+", default=[0, 2, 3, 4], help="正向指标位置索引")
+    parser.add_argument("--negative", type=int, nargs="+", default=[1, 5], help="负向指标位置索引")
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="每块行数")
+    parser.add_argument("--sheet", default=None, help="Excel工作表名称")
+    args = parser.parse_args()
+
+    chunked_topsis(args.input, args.output, args.category, args.start_col, args.positive, args.negative,
+                   args.chunk_rows, args.sheet)
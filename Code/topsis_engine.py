@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+
+# 输出的计算结果列（与TOPSIS.py中topsis()的返回列一致）
+RESULT_COLUMNS = ["到正理想解距离", "到负理想解距离", "贴近度"]
+
+
+def group_segments(categories):
+    """
+    按分类排序（与groupby一致：分类升序、组内保持原顺序、分类为空的行不参与）
+    :return: (order, keys, starts, sizes)：排序后的行号、各组分类值、各组起始位置、各组行数
+    """
+    codes, keys = pd.factorize(categories, sort=True)
+    valid = np.flatnonzero(codes >= 0)
+    order = valid[np.argsort(codes[valid], kind="stable")]
+    sizes = np.bincount(codes[valid], minlength=len(keys))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    return order, keys, starts, sizes
+
+
+def indicator_masks(m, positive_indices, negative_indices):
+    """正向、负向指标的布尔掩码；同时出现在两个列表中的指标按正向处理（与topsis()中先判断正向指标一致）"""
+    positive = np.zeros(m, dtype=bool)
+    positive[list(positive_indices)] = True
+    negative = np.zeros(m, dtype=bool)
+    negative[list(negative_indices)] = True
+    negative &= ~positive
+    return positive, negative
+
+
+def standardize(data, min_val, max_val, positive, negative):
+    """
+    极差标准化并加1e-6（min_val、max_val为与data同形状的每行所在组的最小、最大值）
+    指标无差异则全部为1，既非正向也非负向的指标为0
+    """
+    span = max_val - min_val
+    data_std = np.zeros(data.shape, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        data_std[:, positive] = (data[:, positive] - min_val[:, positive]) / span[:, positive]
+        data_std[:, negative] = (max_val[:, negative] - data[:, negative]) / span[:, negative]
+    data_std[max_val == min_val] = 1.0
+    # 避免后续log(0)，整体增加微小值
+    data_std += 1e-6
+    return data_std
+
+
+def segmented_entropy_weights(data_std, starts, sizes):
+    """各组的熵权（data_std为已标准化、已按分组排好的矩阵），返回 组数×指标数"""
+    gid = np.repeat(np.arange(len(sizes)), sizes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = data_std / np.add.reduceat(data_std, starts, axis=0)[gid]
+        e = -np.add.reduceat(p * np.log(p), starts, axis=0) / np.log(sizes)[:, None]
+        g = 1 - e
+        return g / np.sum(g, axis=1, keepdims=True)
+
+
+def segmented_topsis(data, starts, sizes, positive_indices, negative_indices):
+    """
+    分段熵权TOPSIS：data已按分组排好（同组的行连续），所有分组一次算完
+    每组内的计算步骤与topsis()相同（极差标准化、+1e-6、熵权、欧式距离），结果逐位相同
+    :param data: 行数×指标数 的数值矩阵
+    :return: (到正理想解距离, 到负理想解距离, 贴近度)，均未取整
+    """
+    data = np.asarray(data)
+    n_rows, m = data.shape
+    gid = np.repeat(np.arange(len(sizes)), sizes)
+
+    # 各组各指标的最大值、最小值
+    min_val = np.minimum.reduceat(data, starts, axis=0)[gid]
+    max_val = np.maximum.reduceat(data, starts, axis=0)[gid]
+
+    positive, negative = indicator_masks(m, positive_indices, negative_indices)
+    data_std = standardize(data, min_val, max_val, positive, negative)
+
+    # 熵权
+    w = segmented_entropy_weights(data_std, starts, sizes)
+
+    weight_std_data = data_std * w[gid]
+    z_positive = np.maximum.reduceat(weight_std_data, starts, axis=0)[gid]
+    z_negative = np.minimum.reduceat(weight_std_data, starts, axis=0)[gid]
+    d_positive = np.sqrt(np.sum((weight_std_data - z_positive) ** 2, axis=1))
+    d_negative = np.sqrt(np.sum((weight_std_data - z_negative) ** 2, axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        closeness = d_negative / (d_positive + d_negative)
+    return d_positive, d_negative, closeness
+
+
+def segmented_rank(values, starts, sizes):
+    """组内降序排名（并列取最小名次，同pandas的rank(method="min", ascending=False)）"""
+    gid = np.repeat(np.arange(len(sizes)), sizes)
+    order = np.lexsort((-values, gid))
+    s_gid, s_val = gid[order], values[order]
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = (s_gid[1:] != s_gid[:-1]) | (s_val[1:] != s_val[:-1])
+    run_first = np.maximum.accumulate(np.where(new_run, np.arange(len(order)), 0))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = run_first - starts[s_gid] + 1
+    return ranks
+
+
+def segmented_sort_by_rank(ranks, starts, sizes):
+    """
+    各组按排名升序排列后的行号
+    没有并列名次的组按名次排序结果唯一；有并列名次的组逐组用与sort_values相同的quicksort，保证并列行的先后与原来一致
+    """
+    gid = np.repeat(np.arange(len(sizes)), sizes)
+    order = np.lexsort((ranks, gid))
+    s_ranks = ranks[order]
+    tied = np.zeros(len(order), dtype=bool)
+    tied[1:] = (gid[order][1:] == gid[order][:-1]) & (s_ranks[1:] == s_ranks[:-1])
+    for group in np.unique(gid[order][tied]):
+        start, size = starts[group], sizes[group]
+        order[start:start + size] = start + np.argsort(ranks[start:start + size], kind="quicksort")
+    return order
+
+
+def topsis_by_category(df, category_col, indicator_start_col, positive_indices, negative_indices):
+    """
+    所有分类一次完成熵权TOPSIS排名，结果与对每个groupby分组调用group_sort后合并完全相同
+    :return: 非指标列 + 到正理想解距离、到负理想解距离、贴近度（保留3位小数）+ 排名，按分类、排名排列
+    """
+    order, keys, starts, sizes = group_segments(df[category_col])
+    sorted_df = df.iloc[order]
+    indicator_data = sorted_df.iloc[:, indicator_start_col:].values
+    if not np.issubdtype(indicator_data.dtype, np.number):
+        raise ValueError("指标列包含非数值数据")
+
+    d_positive, d_negative, closeness = segmented_topsis(indicator_data, starts, sizes,
+                                                         positive_indices, negative_indices)
+    closeness = closeness.round(3)
+    # 贴近度无法计算（组内只有一家店铺或指标全部无差异）时，原流程在排名取整时报错
+    bad = np.unique(np.repeat(np.arange(len(sizes)), sizes)[np.isnan(closeness)])
+    if len(bad):
+        raise ValueError(f"分类 {list(keys[bad])} 的贴近度无法计算（店铺数过少或指标无差异）")
+    ranks = segmented_rank(closeness, starts, sizes)
+    rank_order = segmented_sort_by_rank(ranks, starts, sizes)
+
+    result = sorted_df.iloc[rank_order, :indicator_start_col].reset_index(drop=True)
+    result["到正理想解距离"] = d_positive.round(3)[rank_order]
+    result["到负理想解距离"] = d_negative.round(3)[rank_order]
+    result["贴近度"] = closeness[rank_order]
+    result["排名"] = ranks[rank_order]
+    return result
@@ -0,0 +1,149 @@
+import pandas as pd
+
+from topsis_engine import topsis_by_category
+
+
+class IncrementalTopsis:
+    """
+    增量TOPSIS排名：保存当前店铺表和每个分类的排名结果，店铺新增、修改、删除时只重算受影响的分类
+    熵权由组内每家店铺的标准化值共同决定，组内任何一家店铺的指标变化都会改变该组的权重、理想解和全部距离，
+    因此以分类为单位重算（多个分类一次向量化算完），其余分类直接复用上次的结果
+    结果与对当前整张表调用topsis_by_category完全相同（店铺数不足2家的分类不参与排名）
+    """
+
+    def __init__(self, id_col, category_col, indicator_start_col, positive_indices, negative_indices):
+        self.id_col = id_col
+        self.category_col = category_col
+        self.indicator_start_col = indicator_start_col
+        self.positive_indices = positive_indices
+        self.negative_indices = negative_indices
+        self.table = None
+        self.results = {}
+        self.dirty = set()
+        self.unranked = []
+
+    def _mark(self, categories):
+        self.dirty.update(c for c in categories if pd.notna(c))
+
+    def upsert(self, df):
+        """
+        新增或修改店铺（列布局与TOPSIS.py读取的店铺表相同），指标未变化的店铺不会触发重算
+        :return: 新增和修改的店铺数
+        """
+        new = df.set_index(self.id_col, drop=False)
+        new = new[~new.index.duplicated(keep="last")]
+        if self.table is None:
+            self.table = new.copy()
+            self._mark(new[self.category_col].unique())
+            return len(new)
+
+        new = new[self.table.columns]
+        existing = new.index.isin(self.table.index)
+        old = self.table.loc[new.index[existing]]
+        incoming = new[existing]
+        same = (old == incoming) | (old.isna() & incoming.isna())
+        changed = ~same.all(axis=1).to_numpy()
+        # 分类变化时原分类和新分类都需要重算
+        self._mark(old[self.category_col][changed])
+        self._mark(incoming[self.category_col][changed])
+        self.table.loc[incoming.index[changed]] = incoming[changed]
+
+        added = new[~existing]
+        if len(added):
+            self._mark(added[self.category_col].unique())
+            self.table = pd.concat([self.table, added])
+        return int(changed.sum()) + len(added)
+
+    def delete(self, shop_ids):
+        """删除店铺，返回实际删除的店铺数"""
+        if self.table is None:
+            return 0
+        drop = self.table.index[self.table.index.isin(shop_ids)]
+        self._mark(self.table.loc[drop, self.category_col].unique())
+        self.table = self.table.drop(drop)
+        return len(drop)
+
+    def sync(self, df):
+        """与一份完整的店铺快照对齐：快照中没有的店铺删除，其余按upsert处理"""
+        removed = 0
+        if self.table is not None:
+            removed = self.delete(self.table.index.difference(df[self.id_col]))
+        return self.upsert(df), removed
+
+    def _rank(self, sub):
+        """
+        对若干分类一次完成排名；其中有分类无法计算（指标无差异等）时改为逐个分类计算，跳过无法排名的分类
+        :return: ({分类: 排名结果}, 无法排名的分类列表)
+        """
+        args = (self.category_col, self.indicator_start_col, self.positive_indices, self.negative_indices)
+        failed = []
+        try:
+            ranked = [topsis_by_category(sub.reset_index(drop=True), *args)]
+        except ValueError:
+            ranked = []
+            for category, group in sub.groupby(self.category_col, sort=True):
+                try:
+                    ranked.append(topsis_by_category(group.reset_index(drop=True), *args))
+                except ValueError as e:
+                    print(f"分类 {category} 暂不排名：{e}")
+                    failed.append(category)
+        results = {}
+        for frame in ranked:
+            for category, group in frame.groupby(self.category_col, sort=False):
+                results[category] = group.reset_index(drop=True)
+        return results, failed
+
+    def refresh(self):
+        """重算所有受影响分类的排名，返回重算的分类列表"""
+        dirty = sorted(self.dirty)
+        if not dirty:
+            return []
+        sub = self.table[self.table[self.category_col].isin(dirty)]
+        sizes = sub[self.category_col].value_counts()
+        # 只有1家店铺的分类无法计算熵权，暂不排名，店铺数达到2家后自动参与；指标无差异等无法排名的分类同样处理
+        small = sizes.index[sizes < 2]
+        sub = sub[~sub[self.category_col].isin(small)]
+        results, failed = self._rank(sub) if len(sub) else ({}, [])
+
+        # 全部计算完成后再更新缓存，计算出错时不会丢掉其他分类的结果
+        for category in dirty:
+            self.results.pop(category, None)
+        self.results.update(results)
+        self.unranked = sorted(set(self.unranked).difference(dirty).union(small).union(failed))
+        self.dirty.clear()
+        return dirty
+
+    def result(self, categories=None):
+        """当前排名结果（按分类、排名排列，与topsis_by_category的输出格式相同）"""
+        self.refresh()
+        keys = sorted(self.results) if categories is None else [c for c in categories if c in self.results]
+        if not keys:
+            return pd.DataFrame()
+        return pd.concat([self.results[c] for c in keys], ignore_index=True)
+
+    def rank_of(self, shop_id):
+        """某家店铺当前在其分类中的名次，未参与排名时返回None"""
+        self.refresh()
+        if self.table is None or shop_id not in self.table.index:
+            return None
+        group = self.results.get(self.table.at[shop_id, self.category_col])
+        if group is None:
+            return None
+        rank = group.loc[group[self.id_col].to_numpy() == shop_id, "排名"]
+        return int(rank.iloc[0]) if len(rank) else None
+
+
+def rank_store(ranker, store, indicators=None):
+    """
+    店铺库刷新后同步排名：读取MerchantStore的当前快照（与export_snapshot相同的列布局），只重算有变化的分类
+    :param ranker: IncrementalTopsis
+    :param indicators: 额外指标（需含"店铺ID"列），同export_snapshot
+    :return: 重算的分类列表
+    """
+    from merchant_store import snapshot_frame
+
+    frame = snapshot_frame(store, indicators)
+    # 指标有空值（如评分为"暂无数据"）的店铺无法参与计算
+    frame = frame[frame.iloc[:, ranker.indicator_start_col:].notna().all(axis=1).to_numpy()]
+    ranker.sync(frame)
+    return ranker.refresh()
@@ -0,0 +1,200 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from topsis_engine import group_segments, indicator_masks, segmented_entropy_weights, standardize
+
+# 每批权重组计算贴近度时张量占用的内存上限（字节）
+MEMORY_BUDGET = 256 * 1024 * 1024
+# batch_closeness中同时存在的 权重组数×店铺数×指标数 float64张量个数（加权矩阵、与理想解之差、平方）
+TENSOR_COPIES = 3
+
+
+def dirichlet_weights(base_weights, n_samples, concentration=100.0, rng=None):
+    """
+    在基准权重附近随机抽取权重：Dirichlet分布，均值为base_weights，concentration越大越集中
+    :return: n_samples×指标数 的权重矩阵（每行和为1）
+    """
+    rng = np.random.default_rng(rng)
+    alpha = np.maximum(np.asarray(base_weights, dtype=float) * concentration, 1e-6)
+    return rng.dirichlet(alpha, size=n_samples)
+
+
+def normalize_weights(weights):
+    """用户给定的权重（每行一组）归一化为每行和为1"""
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    if (weights < 0).any():
+        raise ValueError("权重不能为负数")
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def batch_closeness(data_std, weights):
+    """
+    多组权重一次计算贴近度：权重×店铺×指标 的张量上计算理想解和距离
+    :param data_std: 店铺数×指标数 的标准化矩阵（一个分类）
+    :param weights: 权重组数×指标数
+    :return: 权重组数×店铺数 的贴近度（保留3位小数，与排名结果一致）
+    """
+    weighted = weights[:, None, :] * data_std[None, :, :]
+    z_positive = weighted.max(axis=1, keepdims=True)
+    z_negative = weighted.min(axis=1, keepdims=True)
+    d_positive = np.sqrt(np.sum((weighted - z_positive) ** 2, axis=2))
+    d_negative = np.sqrt(np.sum((weighted - z_negative) ** 2, axis=2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (d_negative / (d_positive + d_negative)).round(3)
+
+
+def batch_rank(closeness):
+    """每行（一组权重）内降序排名，并列取最小名次"""
+    k, n = closeness.shape
+    order = np.argsort(-closeness, axis=1, kind="stable")
+    values = np.take_along_axis(closeness, order, axis=1)
+    new_run = np.ones((k, n), dtype=bool)
+    new_run[:, 1:] = values[:, 1:] != values[:, :-1]
+    run_first = np.maximum.accumulate(np.where(new_run, np.arange(n), 0), axis=1)
+    ranks = np.empty((k, n), dtype=np.int64)
+    np.put_along_axis(ranks, order, run_first + 1, axis=1)
+    return ranks
+
+
+def category_sensitivity(data, positive_indices, negative_indices, weights=None, n_samples=1000,
+                         concentration=100.0, memory_budget=MEMORY_BUDGET, rng=None):
+    """
+    一个分类的排名稳定性分析
+    :param data: 店铺数×指标数 的原始指标矩阵
+    :param weights: 用户给定的权重（组数×指标数），为None时在熵权附近按Dirichlet分布抽取n_samples组
+    :param memory_budget: 每批计算的张量内存上限（字节），每批权重组数 = 内存上限 / (店铺数×指标数×张量大小)
+    :return: (基准名次, 权重组数×店铺数 的名次矩阵, 基准权重)
+    """
+    data = np.asarray(data, dtype=float)
+    n, m = data.shape
+    positive, negative = indicator_masks(m, positive_indices, negative_indices)
+    min_val = np.broadcast_to(data.min(axis=0), data.shape)
+    max_val = np.broadcast_to(data.max(axis=0), data.shape)
+    data_std = standardize(data, min_val, max_val, positive, negative)
+    base = segmented_entropy_weights(data_std, np.array([0]), np.array([n]))[0]
+    if np.isnan(base).any():
+        raise ValueError("熵权无法计算（店铺数过少或指标无差异）")
+
+    weights = dirichlet_weights(base, n_samples, concentration, rng) if weights is None else normalize_weights(weights)
+    if weights.shape[1] != m:
+        raise ValueError(f"权重列数 {weights.shape[1]} 与指标数 {m} 不一致")
+    base_rank = batch_rank(batch_closeness(data_std, base[None, :]))[0]
+    batch_size = max(1, int(memory_budget // (n * m * 8 * TENSOR_COPIES)))
+    ranks = np.concatenate([batch_rank(batch_closeness(data_std, weights[i:i + batch_size]))
+                            for i in range(0, len(weights), batch_size)])
+    return base_rank, ranks, base
+
+
+def rank_distribution(base_rank, ranks, top_n=3):
+    """各店铺名次分布的统计量"""
+    return pd.DataFrame({
+        "基准排名": base_rank,
+        "平均排名": ranks.mean(axis=0).round(2),
+        "排名标准差": ranks.std(axis=0).round(2),
+        "最好排名": ranks.min(axis=0),
+        "5%分位排名": np.percentile(ranks, 5, axis=0),
+        "95%分位排名": np.percentile(ranks, 95, axis=0),
+        "最差排名": ranks.max(axis=0),
+        "排名不变概率": (ranks == base_rank).mean(axis=0).round(3),
+        f"进入前{top_n}概率": (ranks <= top_n).mean(axis=0).round(3),
+    })
+
+
+def adjacent_flips(base_rank, ranks):
+    """
+    基准排名相邻的两家店铺的翻转概率：后一名在抽样权重下排到前一名之前的比例
+    :return: DataFrame(前一名位置, 后一名位置, 翻转概率)，位置为店铺在分类中的行号
+    """
+    order = np.argsort(base_rank, kind="stable")
+    upper, lower = order[:-1], order[1:]
+    flip = (ranks[:, lower] < ranks[:, upper]).mean(axis=0)
+    return pd.DataFrame({"upper": upper, "lower": lower, "翻转概率": flip.round(3)})
+
+
+def topsis_sensitivity(df, category_col, indicator_start_col, positive_indices, negative_indices,
+                       weights=None, n_samples=1000, concentration=100.0, top_n=3, seed=None,
+                       memory_budget=MEMORY_BUDGET):
+    """
+    所有分类的TOPSIS排名稳定性分析：每个分类在其熵权附近抽取n_samples组权重（或使用给定的weights），
+    每组权重下重新计算贴近度和名次，统计各店铺的名次分布和相邻名次翻转概率
+    熵权无法计算的分类（指标无差异等）打印提示后跳过，不影响其余分类
+    :return: (店铺名次分布表, 相邻名次翻转概率表)，均按分类、基准排名排列
+    """
+    rng = np.random.default_rng(seed)
+    order, keys, starts, sizes = group_segments(df[category_col])
+    sorted_df = df.iloc[order]
+    indicator_data = sorted_df.iloc[:, indicator_start_col:].values
+    if not np.issubdtype(indicator_data.dtype, np.number):
+        raise ValueError("指标列包含非数值数据")
+    # 自定义权重对所有分类相同，先检查一次，循环中的ValueError只可能来自熵权无法计算
+    if weights is not None:
+        weights = normalize_weights(weights)
+        if weights.shape[1] != indicator_data.shape[1]:
+            raise ValueError(f"权重列数 {weights.shape[1]} 与指标数 {indicator_data.shape[1]} 不一致")
+    info = sorted_df.iloc[:, :indicator_start_col].reset_index(drop=True)
+    name_col = info.columns[1] if info.shape[1] > 1 else info.columns[0]
+
+    dist_frames, flip_frames = [], []
+    for key, start, size in zip(keys, starts, sizes):
+        if size < 2:
+            print(f"分类 {key} 只有 {size} 家店铺，跳过稳定性分析")
+            continue
+        try:
+            base_rank, ranks, _ = category_sensitivity(indicator_data[start:start + size], positive_indices,
+                                                       negative_indices, weights, n_samples, concentration,
+                                                       memory_budget, rng)
+        except ValueError as e:
+            print(f"分类 {key} {e}，跳过稳定性分析")
+            continue
+        group_info = info.iloc[start:start + size].reset_index(drop=True)
+        dist = pd.concat([group_info, rank_distribution(base_rank, ranks, top_n)], axis=1)
+        dist_frames.append(dist.sort_values("基准排名", kind="stable"))
+
+        flips = adjacent_flips(base_rank, ranks)
+        flip_frames.append(pd.DataFrame({
+            category_col: key,
+            "前一名": group_info[name_col].to_numpy()[flips["upper"]],
+            "前一名基准排名": base_rank[flips["upper"]],
+            "后一名": group_info[name_col].to_numpy()[flips["lower"]],
+            "后一名基准排名": base_rank[flips["lower"]],
+            "翻转概率": flips["翻转概率"],
+        }))
+    dist_result = pd.concat(dist_frames, ignore_index=True) if dist_frames else pd.DataFrame()
+    flip_result = pd.concat(flip_frames, ignore_index=True) if flip_frames else pd.DataFrame()
+    return dist_result, flip_result
+
+
+def save_sensitivity(dist_result, flip_result, save_path):
+    """两张表保存到同一个Excel文件的两个工作表"""
+    with pd.ExcelWriter(save_path) as writer:
+        dist_result.to_excel(writer, sheet_name="店铺排名分布", index=False)
+        flip_result.to_excel(writer, sheet_name="相邻名次翻转概率", index=False)
+    print(f"排名稳定性分析结果已保存到：{save_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TOPSIS排名的权重敏感性（蒙特卡洛）分析")
+    parser.add_argument("input", help="店铺表（.xlsx）")
+    parser.add_argument("output", help="分析结果（.xlsx）")
+    parser.add_argument("--sheet", default="Sheet1", help="工作表名称")
+    parser.add_argument("--category", default="店铺分类", help="分类列名")
+    parser.add_argument("--start-col", type=int, default=5, help="指标列起始位置索引")
+    parser.add_argument("--positive", type=int, nargs="+", default=[0, 2, 3, 4], help="正向指标位置索引")
+    parser.add_argument("--negative", type=int, nargs="+", default=[1, 5], help="负向指标位置索引")
+    parser.add_argument("--samples", type=int, default=1000, help="每个分类抽取的权重组数")
+    parser.add_argument("--concentration", type=float, default=100.0, help="Dirichlet集中度，越大权重越接近熵权")
+    parser.add_argument("--weights", default=None, help="自定义权重CSV（无表头，每行一组权重，列数等于指标数），给定后不再随机抽取")
+    parser.add_argument("--top", type=int, default=3, help="统计进入前N名的概率")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET // (1024 * 1024),
+                        help="每批计算的张量内存上限（MB）")
+    args = parser.parse_args()
+
+    df = pd.read_excel(args.input, sheet_name=args.sheet)
+    weights = pd.read_csv(args.weights, header=None).to_numpy() if args.weights else None
+    dist_result, flip_result = topsis_sensitivity(df, args.category, args.start_col, args.positive, args.negative,
+                                                  weights, args.samples, args.concentration, args.top, args.seed,
+                                                  args.memory_mb * 1024 * 1024)
+    save_sensitivity(dist_result, flip_result, args.output)
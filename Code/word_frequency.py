@@ -0,0 +1,192 @@
+import os
+import re
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from segmenter import Vocabulary, load_stopwords
+from stage_io import STAGE_SUFFIX, read_stage
+
+# scipy为可选依赖：有则用稀疏矩阵保存 词×店铺 词频，否则用稠密数组
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+# 至少包含一个汉字、字母或数字的词才计入词频（去掉空格和标点）
+WORD_PATTERN = re.compile(r"[一-鿿A-Za-z0-9]")
+
+
+def count_shop(path):
+    """
+    统计一个店铺文件的词频（在子进程中运行）
+    有分词ID列时返回 ("ids", 各词ID出现次数的数组)，旧结果只有分词结果时返回 ("words", Counter)
+    两种结果都可以直接相加合并
+    """
+    shop = os.path.splitext(os.path.basename(path))[0]
+    columns = []
+    if path.endswith(STAGE_SUFFIX):
+        import pyarrow.parquet as pq
+        columns = pq.read_schema(path).names
+    if "分词ID" in columns:
+        ids = read_stage(path, columns=["分词ID"])["分词ID"]
+        flat = np.concatenate([np.asarray(x, dtype=np.int64) for x in ids]) if len(ids) else np.zeros(0, np.int64)
+        return shop, "ids", np.bincount(flat)
+    texts = read_stage(path, columns=["分词结果"])["分词结果"].fillna("")
+    counter = Counter()
+    for text in texts:
+        counter.update(text.split())
+    return shop, "words", counter
+
+
+class FrequencyMatrix:
+    """
+    词×店铺 词频矩阵
+    :param vocab: Vocabulary，行号即词ID
+    :param shops: 店铺名列表，列顺序
+    :param counts: 词数×店铺数 的稀疏矩阵（csc）或稠密数组
+    """
+
+    def __init__(self, vocab, shops, counts):
+        self.vocab = vocab
+        self.shops = list(shops)
+        self.counts = counts
+
+    @classmethod
+    def from_shop_counts(cls, vocab, shop_counts):
+        """由各店铺的词频（ID计数数组或Counter）合并成矩阵，Counter中的新词追加到词表"""
+        shops, columns = [], []
+        for shop, kind, counts in shop_counts:
+            if kind == "words":
+                words = list(counts)
+                ids = vocab.encode(words)
+                column = np.zeros(len(vocab), dtype=np.int64)
+                column[ids] = [counts[w] for w in words]
+                counts = column
+            shops.append(shop)
+            columns.append(counts)
+        n_words = len(vocab)
+        rows, cols, data = [], [], []
+        for j, column in enumerate(columns):
+            nz = np.flatnonzero(column)
+            rows.append(nz)
+            cols.append(np.full(len(nz), j, dtype=np.int64))
+            data.append(column[nz])
+        rows = np.concatenate(rows) if rows else np.zeros(0, np.int64)
+        cols = np.concatenate(cols) if cols else np.zeros(0, np.int64)
+        data = np.concatenate(data) if data else np.zeros(0, np.int64)
+        if sparse is not None:
+            counts = sparse.csc_matrix((data, (rows, cols)), shape=(n_words, len(shops)), dtype=np.int64)
+        else:
+            counts = np.zeros((n_words, len(shops)), dtype=np.int64)
+            counts[rows, cols] = data
+        return cls(vocab, shops, counts)
+
+    def word_mask(self, min_length=2, stopwords=()):
+        """需要保留的词：长度至少min_length、含汉字/字母/数字、不在停用词中"""
+        return np.array([len(w) >= min_length and WORD_PATTERN.search(w) is not None and w not in stopwords
+                         for w in self.vocab.words], dtype=bool)
+
+    def filtered(self, min_length=2, stopwords=()):
+        """去掉不需要的词（词ID不变，只把对应行清零）"""
+        keep = self.word_mask(min_length, stopwords)
+        if sparse is not None:
+            counts = sparse.diags(keep.astype(np.int64), dtype=np.int64) @ self.counts
+            counts = counts.tocsc()
+            counts.eliminate_zeros()
+        else:
+            counts = self.counts * keep[:, None]
+        return FrequencyMatrix(self.vocab, self.shops, counts)
+
+    def shop_column(self, shop):
+        """某个店铺的词频列（稠密数组）"""
+        j = self.shops.index(shop)
+        column = self.counts[:, j]
+        return column.toarray().ravel() if sparse is not None else column
+
+    def top_words(self, shop, n=150):
+        """某个店铺词频最高的n个词：DataFrame(word, freq)"""
+        column = self.shop_column(shop)
+        nz = np.flatnonzero(column)
+        order = nz[np.lexsort((nz, -column[nz]))][:n]
+        words = np.array(self.vocab.words, dtype=object)
+        return pd.DataFrame({"word": words[order], "freq": column[order]})
+
+    def top_table(self, n=50):
+        """所有店铺的前n个高频词：长表 DataFrame(店铺, 排名, 词, 词频)"""
+        frames = []
+        for shop in self.shops:
+            top = self.top_words(shop, n)
+            frames.append(pd.DataFrame({"店铺": shop, "排名": np.arange(1, len(top) + 1),
+                                        "词": top["word"], "词频": top["freq"]}))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["店铺", "排名", "词", "词频"])
+
+    def comparison_frame(self, shops=None, n=None):
+        """
+        选定店铺的 词×店铺 稠密词频表（对应R脚本中acast得到的矩阵），只保留在这些店铺中出现过的词
+        :param n: 只保留总词频最高的n个词
+        """
+        shops = shops or self.shops
+        cols = [self.shops.index(s) for s in shops]
+        sub = self.counts[:, cols]
+        sub = sub.toarray() if sparse is not None else sub
+        total = sub.sum(axis=1)
+        rows = np.flatnonzero(total)
+        rows = rows[np.lexsort((rows, -total[rows]))]
+        if n:
+            rows = rows[:n]
+        words = np.array(self.vocab.words, dtype=object)[rows]
+        return pd.DataFrame(sub[rows], index=words, columns=shops)
+
+    def export_freq_csvs(self, output_dir, n=None):
+        """每个店铺导出一个 {店铺名}_freq.csv（word,freq两列，GB18030编码），供对比词云R脚本读取"""
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for shop in self.shops:
+            path = os.path.join(output_dir, f"{shop}_freq.csv")
+            self.top_words(shop, n or len(self.vocab)).to_csv(path, index=False, encoding="gb18030")
+            paths.append(path)
+        return paths
+
+
+def build_frequency_matrix(input_dir, workers=None):
+    """并行统计文件夹中每个店铺分析结果的词频，合并成 词×店铺 矩阵"""
+    names = sorted(f for f in os.listdir(input_dir) if f.endswith((STAGE_SUFFIX, ".xlsx")))
+    # 同名的Parquet和Excel导出只统计Parquet
+    bases = {os.path.splitext(f)[0] for f in names if f.endswith(STAGE_SUFFIX)}
+    paths = [os.path.join(input_dir, f) for f in names
+             if f.endswith(STAGE_SUFFIX) or os.path.splitext(f)[0] not in bases]
+    vocab = Vocabulary(os.path.join(input_dir, "分词词表.json"))
+    if workers == 1 or len(paths) <= 1:
+        shop_counts = [count_shop(p) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shop_counts = list(executor.map(count_shop, paths))
+    return FrequencyMatrix.from_shop_counts(vocab, shop_counts)
+
+
+def main(input_dir, output_dir, top_n=150, workers=None, min_length=2, stopwords=None):
+    matrix = build_frequency_matrix(input_dir, workers)
+    matrix = matrix.filtered(min_length, load_stopwords(stopwords) if stopwords else ())
+    os.makedirs(output_dir, exist_ok=True)
+    matrix.top_table(top_n).to_csv(os.path.join(output_dir, "高频词.csv"), index=False, encoding="utf-8-sig")
+    paths = matrix.export_freq_csvs(output_dir, top_n)
+    print(f"共 {len(matrix.shops)} 家店铺、{len(matrix.vocab)} 个词，词频文件已保存到 {output_dir}（{len(paths)} 个）")
+    return matrix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按店铺统计分词词频，导出对比词云所需的词频CSV")
+    parser.add_argument("input", help="分析结果文件夹（含分词结果/分词ID）")
+    parser.add_argument("output", help="词频文件输出文件夹")
+    parser.add_argument("--top", type=int, default=150, help="每个店铺导出的高频词个数")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认CPU核数")
+    parser.add_argument("--min-length", type=int, default=2, help="词的最短长度")
+    parser.add_argument("--stopwords", default=None, help="停用词文件（每行一个词）")
+    args = parser.parse_args()
+
+    main(args.input, args.output, args.top, args.workers, args.min_length, args.stopwords)